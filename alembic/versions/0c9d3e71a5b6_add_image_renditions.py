@@ -0,0 +1,29 @@
+"""add image renditions
+
+Revision ID: 0c9d3e71a5b6
+Revises: f2d86b0c4e19
+Create Date: 2026-10-18 14:58:46.205371
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '0c9d3e71a5b6'
+down_revision: Union[str, None] = 'f2d86b0c4e19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('posts', sa.Column('image_renditions', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+    op.add_column('users', sa.Column('profile_renditions', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'profile_renditions')
+    op.drop_column('posts', 'image_renditions')
@@ -0,0 +1,37 @@
+"""add tagpostlinks post_created_at
+
+Revision ID: 3f7a9c5e1d24
+Revises: 6d1b8f2e4a93
+Create Date: 2026-10-18 16:42:51.730612
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f7a9c5e1d24'
+down_revision: Union[str, None] = '6d1b8f2e4a93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('tagpostlinks', sa.Column('post_created_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False))
+    op.execute(
+        '''
+        UPDATE tagpostlinks
+        SET post_created_at = posts.created_at
+        FROM posts
+        WHERE posts.uid = tagpostlinks.post_uid AND posts.created_at IS NOT NULL
+        '''
+    )
+    op.create_index('ix_tagpostlinks_tag_uid_post_created_at', 'tagpostlinks', ['tag_uid', 'post_created_at', 'post_uid'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tagpostlinks_tag_uid_post_created_at', table_name='tagpostlinks')
+    op.drop_column('tagpostlinks', 'post_created_at')
@@ -0,0 +1,27 @@
+"""add likes post_uid uid index
+
+Revision ID: 4c8e2a7f0b93
+Revises: e7c41b9d2f35
+Create Date: 2026-10-18 20:12:08.531742
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4c8e2a7f0b93'
+down_revision: Union[str, None] = 'e7c41b9d2f35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_likes_post_uid_uid', 'likes', ['post_uid', 'uid'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_likes_post_uid_uid', table_name='likes')
@@ -0,0 +1,41 @@
+"""add user search indexes
+
+Revision ID: 5b0e4c7d9a21
+Revises: c3dcb1448415
+Create Date: 2026-10-18 13:05:12.418230
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b0e4c7d9a21'
+down_revision: Union[str, None] = 'c3dcb1448415'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # trigram indexes serve both the prefix LIKE and the % similarity filter
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_index(
+        'ix_users_username_trgm',
+        'users',
+        [sa.text('lower(username) gin_trgm_ops')],
+        postgresql_using='gin',
+    )
+    op.create_index(
+        'ix_users_full_name_trgm',
+        'users',
+        [sa.text('lower(full_name) gin_trgm_ops')],
+        postgresql_using='gin',
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_users_full_name_trgm', table_name='users')
+    op.drop_index('ix_users_username_trgm', table_name='users')
@@ -0,0 +1,55 @@
+"""add unique tag name
+
+Revision ID: 6d1b8f2e4a93
+Revises: 0c9d3e71a5b6
+Create Date: 2026-10-18 16:10:27.093418
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6d1b8f2e4a93'
+down_revision: Union[str, None] = '0c9d3e71a5b6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # same normalization as normalize_tag_names in the tag service
+    op.execute(
+        "UPDATE tags SET tag_name = '#' || btrim(ltrim(lower(btrim(tag_name)), '#'))"
+    )
+    # every duplicate points at the tag kept for its name
+    op.execute(
+        '''
+        CREATE TEMPORARY TABLE tag_duplicates ON COMMIT DROP AS
+        SELECT uid AS duplicate_uid, keeper_uid
+        FROM (
+            SELECT uid, first_value(uid) OVER (PARTITION BY tag_name ORDER BY uid) AS keeper_uid
+            FROM tags
+        ) AS ranked
+        WHERE uid <> keeper_uid
+        '''
+    )
+    op.execute(
+        '''
+        INSERT INTO tagpostlinks (tag_uid, post_uid)
+        SELECT tag_duplicates.keeper_uid, tagpostlinks.post_uid
+        FROM tagpostlinks
+        JOIN tag_duplicates ON tag_duplicates.duplicate_uid = tagpostlinks.tag_uid
+        ON CONFLICT DO NOTHING
+        '''
+    )
+    op.execute('DELETE FROM tagpostlinks WHERE tag_uid IN (SELECT duplicate_uid FROM tag_duplicates)')
+    op.execute('DELETE FROM tags WHERE uid IN (SELECT duplicate_uid FROM tag_duplicates)')
+    op.create_index('ux_tags_tag_name', 'tags', ['tag_name'], unique=True)
+
+
+def downgrade() -> None:
+    # the merged duplicates are not restored
+    op.drop_index('ux_tags_tag_name', table_name='tags')
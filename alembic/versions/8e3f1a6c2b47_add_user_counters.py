@@ -0,0 +1,39 @@
+"""add user counters
+
+Revision ID: 8e3f1a6c2b47
+Revises: 5b0e4c7d9a21
+Create Date: 2026-10-18 13:31:40.902114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e3f1a6c2b47'
+down_revision: Union[str, None] = '5b0e4c7d9a21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('followers_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('users', sa.Column('following_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('users', sa.Column('posts_count', sa.Integer(), server_default='0', nullable=False))
+    op.execute(
+        '''
+        UPDATE users SET
+            followers_count = (SELECT count(*) FROM userlinks WHERE userlinks.user_uid = users.uid),
+            following_count = (SELECT count(*) FROM userlinks WHERE userlinks.follower_uid = users.uid),
+            posts_count = (SELECT count(*) FROM posts WHERE posts.user_uid = users.uid)
+        '''
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'posts_count')
+    op.drop_column('users', 'following_count')
+    op.drop_column('users', 'followers_count')
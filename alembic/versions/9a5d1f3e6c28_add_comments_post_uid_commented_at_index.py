@@ -0,0 +1,27 @@
+"""add comments post_uid commented_at index
+
+Revision ID: 9a5d1f3e6c28
+Revises: 4c8e2a7f0b93
+Create Date: 2026-10-18 20:41:27.106385
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a5d1f3e6c28'
+down_revision: Union[str, None] = '4c8e2a7f0b93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_comments_post_uid_commented_at', 'comments', ['post_uid', 'commented_at', 'comment_uid'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_comments_post_uid_commented_at', table_name='comments')
@@ -0,0 +1,31 @@
+"""add userlinks followed_at
+
+Revision ID: a47c2e9f13d8
+Revises: 8e3f1a6c2b47
+Create Date: 2026-10-18 13:52:07.114502
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a47c2e9f13d8'
+down_revision: Union[str, None] = '8e3f1a6c2b47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('userlinks', sa.Column('followed_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False))
+    op.create_index('ix_userlinks_user_uid_followed_at', 'userlinks', ['user_uid', 'followed_at', 'follower_uid'], unique=False)
+    op.create_index('ix_userlinks_follower_uid_followed_at', 'userlinks', ['follower_uid', 'followed_at', 'user_uid'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_userlinks_follower_uid_followed_at', table_name='userlinks')
+    op.drop_index('ix_userlinks_user_uid_followed_at', table_name='userlinks')
+    op.drop_column('userlinks', 'followed_at')
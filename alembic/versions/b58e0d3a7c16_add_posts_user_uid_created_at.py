@@ -0,0 +1,28 @@
+"""add posts user_uid created_at index
+
+Revision ID: b58e0d3a7c16
+Revises: 3f7a9c5e1d24
+Create Date: 2026-10-18 17:25:09.528364
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b58e0d3a7c16'
+down_revision: Union[str, None] = '3f7a9c5e1d24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # newest posts of an author, read when building and merging timelines
+    op.create_index('ix_posts_user_uid_created_at', 'posts', ['user_uid', 'created_at', 'uid'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_posts_user_uid_created_at', table_name='posts')
@@ -0,0 +1,48 @@
+"""add unique likes and shares
+
+Revision ID: e7c41b9d2f35
+Revises: b58e0d3a7c16
+Create Date: 2026-10-18 19:03:44.285190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7c41b9d2f35'
+down_revision: Union[str, None] = 'b58e0d3a7c16'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # keep one row of every duplicated like and share
+    op.execute(
+        '''
+        DELETE FROM likes AS duplicate
+        USING likes AS kept
+        WHERE duplicate.post_uid = kept.post_uid
+            AND duplicate.liker_uid = kept.liker_uid
+            AND duplicate.uid > kept.uid
+        '''
+    )
+    op.execute(
+        '''
+        DELETE FROM shares AS duplicate
+        USING shares AS kept
+        WHERE duplicate.post_uid = kept.post_uid
+            AND duplicate.sharer_uid = kept.sharer_uid
+            AND duplicate.uid > kept.uid
+        '''
+    )
+    op.create_index('ux_likes_post_uid_liker_uid', 'likes', ['post_uid', 'liker_uid'], unique=True)
+    op.create_index('ux_shares_post_uid_sharer_uid', 'shares', ['post_uid', 'sharer_uid'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ux_shares_post_uid_sharer_uid', table_name='shares')
+    op.drop_index('ux_likes_post_uid_liker_uid', table_name='likes')
@@ -0,0 +1,39 @@
+"""add post status
+
+Revision ID: f2d86b0c4e19
+Revises: a47c2e9f13d8
+Create Date: 2026-10-18 14:20:33.671925
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2d86b0c4e19'
+down_revision: Union[str, None] = 'a47c2e9f13d8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+post_status_enum = sa.Enum('processing', 'ready', 'failed', name='poststatusenum')
+
+
+def upgrade() -> None:
+    post_status_enum.create(op.get_bind())
+    # existing posts already have their image so they start as ready
+    op.add_column('posts', sa.Column('status', post_status_enum, server_default='ready', nullable=False))
+    op.alter_column('posts', 'post_image_url',
+               existing_type=sqlmodel.sql.sqltypes.AutoString(),
+               nullable=True)
+
+
+def downgrade() -> None:
+    op.execute("UPDATE posts SET post_image_url = '' WHERE post_image_url IS NULL")
+    op.alter_column('posts', 'post_image_url',
+               existing_type=sqlmodel.sql.sqltypes.AutoString(),
+               nullable=False)
+    op.drop_column('posts', 'status')
+    post_status_enum.drop(op.get_bind())
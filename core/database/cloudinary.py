@@ -1,8 +1,8 @@
 import cloudinary
 import cloudinary.uploader as uploader
-from fastapi import UploadFile
 
 import asyncio
+from typing import BinaryIO
 
 from src.config import Config
 from core.exceptions.exceptions import InterServerException
@@ -15,11 +15,11 @@ config = cloudinary.config(
 )
 
 
-async def upload_file(file: UploadFile, folder_dir: str) -> str:
+async def upload_stream(stream: BinaryIO, folder_dir: str) -> str:
     try:
         # Run the blocking uploader function in a separate thread
         result: dict = await asyncio.to_thread(
-            uploader.upload, file.file, folder=folder_dir
+            uploader.upload, stream, folder=folder_dir
         )
         return result["secure_url"]
     except Exception as e:
@@ -31,7 +31,7 @@ async def delete_file(url: str, folder_path: str) -> None:
     try:
         # sample url sample is public id
         # https://res.cloudinary.com/demo/image/upload/v1612312323/sample.jpg
-        public_id = f"{folder_path}{url.split("/")[-1].split(".")[0]}"
+        public_id = f"{folder_path}/{url.split('/')[-1].split('.')[0]}"
         result: dict = await asyncio.to_thread(uploader.destroy, public_id)
         if result["result"] != "ok":
             raise Exception("Error wile deleting file", result)
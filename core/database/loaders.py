@@ -0,0 +1,60 @@
+from sqlalchemy.orm import selectinload, load_only
+
+from enum import Enum
+
+from .models import User, Post
+from core.utils.enums import UserLoadProfile, PostLoadProfile
+
+# every relationship is lazy="raise_on_sql", so a query only gets the
+# relationships its profile asks for and touching any other one fails loudly
+# instead of emitting a query per row
+_profiles: dict[tuple[type, Enum], list] = {}
+
+
+def register_load_profile(model: type, profile: Enum, options: list) -> None:
+    _profiles[(model, profile)] = options
+
+
+def get_load_options(model: type, profile: Enum) -> list:
+    try:
+        return _profiles[(model, profile)]
+    except KeyError:
+        raise ValueError(f"No {profile.value} load profile for {model.__name__}")
+
+
+register_load_profile(
+    User,
+    UserLoadProfile.identity,
+    [
+        load_only(
+            User.uid,
+            User.username,
+            User.email,
+            User.full_name,
+            User.profile_url,
+            User.hashed_password,
+        )
+    ],
+)
+register_load_profile(User, UserLoadProfile.card, [])
+register_load_profile(
+    User,
+    UserLoadProfile.full,
+    [
+        selectinload(User.followers),
+        selectinload(User.following),
+        selectinload(User.posts),
+    ],
+)
+
+register_load_profile(Post, PostLoadProfile.bare, [])
+register_load_profile(
+    Post,
+    PostLoadProfile.full,
+    [
+        selectinload(Post.tags),
+        selectinload(Post.likes),
+        selectinload(Post.shares),
+        selectinload(Post.comments),
+    ],
+)
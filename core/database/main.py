@@ -1,21 +1,145 @@
-from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlmodel import Session as SyncSession
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlalchemy.orm.session import sessionmaker
+from sqlalchemy.util import await_only
 
 from typing import AsyncGenerator, Any
+import random
+
 from src.config import Config
+from core.database.redis import redis
+from core.utils.metrics import register_metrics
+from .pool import InstrumentedPool
+
+
+def get_pool_sizes() -> tuple[int, int]:
+    """pool size and overflow of this worker, cut down so the pools of every
+    worker stay within DB_MAX_CONNECTIONS when it is set"""
+    pool_size, max_overflow = Config.DB_POOL_SIZE, Config.DB_MAX_OVERFLOW
+    if Config.DB_MAX_CONNECTIONS is not None:
+        per_worker = max(Config.DB_MAX_CONNECTIONS // max(Config.WEB_WORKERS, 1), 1)
+        pool_size = min(pool_size, per_worker)
+        max_overflow = min(max_overflow, per_worker - pool_size)
+    return pool_size, max_overflow
+
+
+def get_connect_args(url: str) -> dict:
+    if "asyncpg" not in url:
+        return {}
+    return {
+        "statement_cache_size": Config.DB_STATEMENT_CACHE_SIZE,
+        "command_timeout": Config.DB_COMMAND_TIMEOUT,
+        "server_settings": {
+            "statement_timeout": str(Config.DB_STATEMENT_TIMEOUT_MS),
+            "idle_in_transaction_session_timeout": str(
+                Config.DB_IDLE_IN_TRANSACTION_TIMEOUT_MS
+            ),
+        },
+    }
+
+
+def create_engine(url: str) -> AsyncEngine:
+    pool_size, max_overflow = get_pool_sizes()
+    return create_async_engine(
+        url=url,
+        poolclass=InstrumentedPool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=Config.DB_POOL_TIMEOUT,
+        pool_recycle=Config.DB_POOL_RECYCLE,
+        pool_pre_ping=Config.DB_POOL_PRE_PING,
+        connect_args=get_connect_args(url),
+    )
+
+
+async_engine = create_engine(Config.DATABASE_URL)
+replica_engines = [create_engine(url) for url in Config.DATABASE_REPLICA_URLS]
+# the engine swaps the pool for a new one on dispose
+register_metrics("database_pool", lambda: async_engine.pool.metrics())
+register_metrics(
+    "database_replica_pools",
+    lambda: [engine.pool.metrics() for engine in replica_engines],
+)
+
+
+class RoutingSession(SyncSession):
+    """Sends the queries of read only sessions to a replica.
+
+    A session opened with info={"read_only": True} reads from one replica,
+    picked once so the session sees a single snapshot source. Everything else
+    goes to the primary: writes, flushes, and any query that follows a write
+    in the same session so it reads what it just wrote. Once a write of a
+    request's session commits, the user reads from the primary for a while
+    (see get_session).
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self._flushing or getattr(clause, "is_dml", False):
+            self.info["wrote"] = True
+            self.info["uncommitted_write"] = True
+        if (
+            not replica_engines
+            or not self.info.get("read_only")
+            or self.info.get("wrote")
+        ):
+            return async_engine.sync_engine
+        if "replica" not in self.info:
+            self.info["replica"] = random.choice(replica_engines)
+        return self.info["replica"].sync_engine
 
-async_engine = create_async_engine(
-    url=Config.DATABASE_URL
-)  # Their are also many kw like max_pool and so on for optimization
 
 Session = sessionmaker(
     bind=async_engine,
     expire_on_commit=False,
     class_=AsyncSession,
+    sync_session_class=RoutingSession,
 )
 
 
+def get_primary_sticky_key(user_uid) -> str:
+    return f"db:primary:{user_uid}"
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def mark_primary_sticky(session: RoutingSession) -> None:
+    """sends the committing user to the primary before the commit returns, so
+    a read following the response can't hit a replica missing the write"""
+    # get_current_principal tags the session with the caller
+    user_uid = session.info.get("user_uid")
+    if not session.info.pop("uncommitted_write", False):
+        return
+    if not replica_engines or user_uid is None:
+        return
+    try:
+        # commit runs in the greenlet of the async session, it can await
+        await_only(
+            redis.set(
+                get_primary_sticky_key(user_uid),
+                1,
+                px=int(Config.DB_REPLICA_STICKY_SECONDS * 1000),
+            )
+        )
+    except Exception as e:
+        # the commit happened, only read your writes is lost
+        print(f"Error while marking {user_uid} sticky to the primary: {e}")
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def discard_uncommitted_write(session: RoutingSession) -> None:
+    session.info.pop("uncommitted_write", None)
+
+
 async def get_session() -> AsyncGenerator[Any, AsyncSession]:
     async with Session() as session:
         yield session
+
+
+async def create_read_session(user_uid=None) -> AsyncSession:
+    """a session whose reads go to a replica, unless the user wrote within the
+    sticky window and the replica may not have their write yet"""
+    read_only = bool(replica_engines)
+    if read_only and user_uid is not None:
+        read_only = not await redis.exists(get_primary_sticky_key(user_uid))
+    return Session(info={"read_only": read_only})
@@ -7,21 +7,47 @@ from sqlmodel import (
     TIMESTAMP,
     Date,
     String,
+    Integer,
     Field,
     Relationship,
+    Index,
+    text,
 )
 
 
+from sqlalchemy.dialects.postgresql import JSONB
+
 import uuid
 import datetime
 
-from core.utils.enums import GenderEnum
+from core.utils.enums import GenderEnum, PostStatusEnum
+from src.config import Config
+
+# relationships never load on their own, a query that needs one opts in with
+# the loader options of a profile in core/database/loaders.py. Strict loading
+# also fails on relationships the session happens to have in memory
+RELATIONSHIP_LAZY = "raise" if Config.STRICT_LOADING else "raise_on_sql"
 
 # for users
 
 
 class UserLinkModel(SQLModel, table=True):
     __tablename__ = "userlinks"
+    # newest first pages of followers and of following
+    __table_args__ = (
+        Index(
+            "ix_userlinks_user_uid_followed_at",
+            "user_uid",
+            "followed_at",
+            "follower_uid",
+        ),
+        Index(
+            "ix_userlinks_follower_uid_followed_at",
+            "follower_uid",
+            "followed_at",
+            "user_uid",
+        ),
+    )
     follower_uid: uuid.UUID = Field(
         sa_column=Column(
             UUID,
@@ -36,6 +62,14 @@ class UserLinkModel(SQLModel, table=True):
             primary_key=True,
         )
     )  # the person who is followed
+    followed_at: datetime.datetime = Field(
+        sa_column=Column(
+            TIMESTAMP,
+            nullable=False,
+            default=datetime.datetime.now,
+            server_default=text("now()"),
+        )
+    )
 
 
 class User(SQLModel, table=True):
@@ -63,6 +97,10 @@ class User(SQLModel, table=True):
             server_default="https://img.freepik.com/free-psd/contact-icon-illustration-isolated_23-2151903337.jpg?t=st=1740481711~exp=1740485311~hmac=de8146f0bcc8630a725995aeed260b912e5d81f35024e30d7980cd861c0a693b&w=1480",
         )
     )
+    profile_renditions: dict[str, str] | None = Field(
+        default=None,
+        sa_column=Column(JSONB, nullable=True),
+    )
     dob: datetime.date = Field(
         sa_column=Column(
             Date,
@@ -73,10 +111,25 @@ class User(SQLModel, table=True):
     username: str = Field(nullable=False, unique=True)
     hashed_password: str = Field(nullable=False, exclude=True)
 
+    # maintained together with the rows they count so a profile can be shown
+    # without loading the lists, see src/auth/commands.py to recompute them
+    followers_count: int = Field(
+        default=0,
+        sa_column=Column(Integer, nullable=False, server_default="0"),
+    )
+    following_count: int = Field(
+        default=0,
+        sa_column=Column(Integer, nullable=False, server_default="0"),
+    )
+    posts_count: int = Field(
+        default=0,
+        sa_column=Column(Integer, nullable=False, server_default="0"),
+    )
+
     posts: list["Post"] = Relationship(
         back_populates="user",
         sa_relationship_kwargs={
-            "lazy": "selectin",
+            "lazy": RELATIONSHIP_LAZY,
             "cascade": "all, delete",
         },
     )
@@ -84,7 +137,7 @@ class User(SQLModel, table=True):
         link_model=UserLinkModel,
         back_populates="followers",
         sa_relationship_kwargs={
-            "lazy": "selectin",
+            "lazy": RELATIONSHIP_LAZY,
             "cascade": "all, delete",
             "primaryjoin": "and_(User.uid == foreign(UserLinkModel.follower_uid), User.uid != UserLinkModel.user_uid)",
             "secondaryjoin": "User.uid == foreign(UserLinkModel.user_uid)",
@@ -95,7 +148,7 @@ class User(SQLModel, table=True):
         link_model=UserLinkModel,
         back_populates="following",
         sa_relationship_kwargs={
-            "lazy": "selectin",
+            "lazy": RELATIONSHIP_LAZY,
             "cascade": "all, delete",
             "primaryjoin": "and_(User.uid == foreign(UserLinkModel.user_uid), User.uid != UserLinkModel.follower_uid)",
             "secondaryjoin": "User.uid == foreign(UserLinkModel.follower_uid)",
@@ -118,6 +171,15 @@ class User(SQLModel, table=True):
 
 class TagAndPostLinkModel(SQLModel, table=True):
     __tablename__ = "tagpostlinks"
+    # newest first pages of the posts of a tag
+    __table_args__ = (
+        Index(
+            "ix_tagpostlinks_tag_uid_post_created_at",
+            "tag_uid",
+            "post_created_at",
+            "post_uid",
+        ),
+    )
     tag_uid: uuid.UUID = Field(
         sa_column=Column(
             UUID,
@@ -133,10 +195,20 @@ class TagAndPostLinkModel(SQLModel, table=True):
             primary_key=True,
         )
     )
+    # copy of posts.created_at so a tag page is read from the index alone
+    post_created_at: datetime.datetime = Field(
+        sa_column=Column(
+            TIMESTAMP,
+            nullable=False,
+            server_default=text("now()"),
+        )
+    )
 
 
 class Tag(SQLModel, table=True):
     __tablename__ = "tags"
+    # names are stored normalized, see normalize_tag_names
+    __table_args__ = (Index("ux_tags_tag_name", "tag_name", unique=True),)
     uid: uuid.UUID = Field(
         sa_column=Column(
             UUID,
@@ -148,12 +220,21 @@ class Tag(SQLModel, table=True):
     posts: list["Post"] = Relationship(
         back_populates="tags",
         link_model=TagAndPostLinkModel,
-        sa_relationship_kwargs={"lazy": "selectin"},
+        sa_relationship_kwargs={"lazy": RELATIONSHIP_LAZY},
     )
 
 
 class Comment(SQLModel, table=True):
     __tablename__ = "comments"
+    # pages the comments of a post newest first
+    __table_args__ = (
+        Index(
+            "ix_comments_post_uid_commented_at",
+            "post_uid",
+            "commented_at",
+            "comment_uid",
+        ),
+    )
     comment_uid: uuid.UUID = Field(
         sa_column=Column(
             UUID,
@@ -170,6 +251,7 @@ class Comment(SQLModel, table=True):
     )
     post: "Post" = Relationship(
         back_populates="comments",
+        sa_relationship_kwargs={"lazy": RELATIONSHIP_LAZY},
     )
 
     commenter_uid: uuid.UUID = Field(Column(UUID, ForeignKey("users.uid")))
@@ -190,6 +272,12 @@ class Comment(SQLModel, table=True):
 
 class Like(SQLModel, table=True):
     __tablename__ = "likes"
+    # a user likes a post once, also serves the likes of a post
+    __table_args__ = (
+        Index("ux_likes_post_uid_liker_uid", "post_uid", "liker_uid", unique=True),
+        # pages the likers of a post
+        Index("ix_likes_post_uid_uid", "post_uid", "uid"),
+    )
     uid: uuid.UUID = Field(
         sa_column=Column(
             UUID,
@@ -205,11 +293,17 @@ class Like(SQLModel, table=True):
             ForeignKey("posts.uid"),
         )
     )
-    post: "Post" = Relationship(back_populates="likes")
+    post: "Post" = Relationship(
+        back_populates="likes",
+        sa_relationship_kwargs={"lazy": RELATIONSHIP_LAZY},
+    )
 
 
 class Share(SQLModel, table=True):
     __tablename__ = "shares"
+    __table_args__ = (
+        Index("ux_shares_post_uid_sharer_uid", "post_uid", "sharer_uid", unique=True),
+    )
     uid: uuid.UUID = Field(
         sa_column=Column(
             UUID,
@@ -225,11 +319,18 @@ class Share(SQLModel, table=True):
             ForeignKey("posts.uid"),
         )
     )
-    post: "Post" = Relationship(back_populates="shares")
+    post: "Post" = Relationship(
+        back_populates="shares",
+        sa_relationship_kwargs={"lazy": RELATIONSHIP_LAZY},
+    )
 
 
 class Post(SQLModel, table=True):
     __tablename__ = "posts"
+    # newest posts of an author
+    __table_args__ = (
+        Index("ix_posts_user_uid_created_at", "user_uid", "created_at", "uid"),
+    )
     uid: uuid.UUID = Field(
         sa_column=Column(
             UUID,
@@ -241,29 +342,44 @@ class Post(SQLModel, table=True):
     tags: list["Tag"] = Relationship(
         back_populates="posts",
         link_model=TagAndPostLinkModel,
-        sa_relationship_kwargs={"lazy": "selectin"},
+        sa_relationship_kwargs={"lazy": RELATIONSHIP_LAZY},
+    )
+    # empty until the media pipeline has uploaded the image, it points to the
+    # full rendition, every rendition url is kept in image_renditions
+    post_image_url: str | None = Field(default=None, nullable=True)
+    image_renditions: dict[str, str] | None = Field(
+        default=None,
+        sa_column=Column(JSONB, nullable=True),
+    )
+    status: PostStatusEnum = Field(
+        default=PostStatusEnum.processing,
+        sa_column=Column(
+            Enum(PostStatusEnum),
+            nullable=False,
+            server_default=PostStatusEnum.ready.value,
+        ),
     )
-    post_image_url: str = Field(nullable=False)
     user_uid: uuid.UUID = Field(
         sa_column=Column(UUID, ForeignKey("users.uid"), nullable=False)
     )
     user: "User" = Relationship(
         back_populates="posts",
+        sa_relationship_kwargs={"lazy": RELATIONSHIP_LAZY},
     )
     comments: list["Comment"] = Relationship(
         cascade_delete=True,
         back_populates="post",
-        sa_relationship_kwargs={"lazy": "selectin"},
+        sa_relationship_kwargs={"lazy": RELATIONSHIP_LAZY},
     )
     likes: list["Like"] = Relationship(
         cascade_delete=True,
         back_populates="post",
-        sa_relationship_kwargs={"lazy": "selectin"},
+        sa_relationship_kwargs={"lazy": RELATIONSHIP_LAZY},
     )
     shares: list["Share"] = Relationship(
         cascade_delete=True,
         back_populates="post",
-        sa_relationship_kwargs={"lazy": "selectin"},
+        sa_relationship_kwargs={"lazy": RELATIONSHIP_LAZY},
     )
 
     created_at: datetime.datetime = Field(
@@ -0,0 +1,63 @@
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+import time
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long checkouts wait for a connection.
+
+    A request that finds every connection checked out waits in `connect` until
+    one is returned or the pool timeout runs out. The wait and the share of the
+    pool in use are kept so a saturated pool shows up in the metrics instead of
+    as slow requests. `connect` runs once per checkout, unlike `_do_get` which
+    calls itself again when it loses a race for an overflow connection.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # metrics
+        self._checkouts = 0
+        self._timeouts = 0
+        self._exhausting_checkouts = 0
+        self._total_wait_seconds = 0.0
+        self._max_wait_seconds = 0.0
+        self._peak_checked_out = 0
+
+    def connect(self):
+        wait_start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except PoolTimeoutError:
+            self._timeouts += 1
+            raise
+        wait_seconds = time.perf_counter() - wait_start
+        self._checkouts += 1
+        self._total_wait_seconds += wait_seconds
+        self._max_wait_seconds = max(self._max_wait_seconds, wait_seconds)
+        # checkouts that took the last free connection, the next one waits
+        if self.checkedout() >= self.size() + max(self._max_overflow, 0):
+            self._exhausting_checkouts += 1
+        self._peak_checked_out = max(self._peak_checked_out, self.checkedout())
+        return connection
+
+    def metrics(self) -> dict:
+        capacity = self.size() + max(self._max_overflow, 0)
+        return {
+            "pool_size": self.size(),
+            "max_overflow": self._max_overflow,
+            "checked_out": self.checkedout(),
+            "idle": self.checkedin(),
+            "overflow": self.overflow(),
+            "peak_checked_out": self._peak_checked_out,
+            "saturation": self.checkedout() / capacity if capacity else 0.0,
+            "checkouts": self._checkouts,
+            "exhausting_checkouts": self._exhausting_checkouts,
+            "timeouts": self._timeouts,
+            "avg_wait_ms": (
+                self._total_wait_seconds / self._checkouts * 1000
+                if self._checkouts
+                else 0.0
+            ),
+            "max_wait_ms": self._max_wait_seconds * 1000,
+        }
@@ -3,7 +3,13 @@ from redis.asyncio import Redis
 from src.config import Config
 from core.exceptions.exceptions import InterServerException
 
-redis = Redis.from_url(Config.REDIS_URL)
+if Config.REDIS_URL.startswith("fakeredis://"):
+    # local stand-in for tests and offline development
+    from fakeredis import aioredis as fake_aioredis
+
+    redis: Redis = fake_aioredis.FakeRedis()
+else:
+    redis = Redis.from_url(Config.REDIS_URL)
 
 
 async def put_data_in_redis(key: str, data: str, expire_in_second: int = 120) -> bool:
@@ -22,7 +28,7 @@ async def put_data_in_redis(key: str, data: str, expire_in_second: int = 120) ->
 async def get_data_from_redis(key: str) -> str | None:
     try:
         data: bytes | None = await redis.get(key)
-        return data.decode()
+        return data.decode() if data is not None else None
     except Exception as e:
         print(f"Error While getting data from redis {e}")
         raise InterServerException()
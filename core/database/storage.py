@@ -0,0 +1,61 @@
+import asyncio
+import shutil
+import uuid
+from pathlib import Path
+from typing import BinaryIO
+
+from src.config import Config
+from core.exceptions.exceptions import InterServerException
+
+
+class CloudinaryStorage:
+    async def upload(self, stream: BinaryIO, folder_dir: str) -> str:
+        from .cloudinary import upload_stream
+
+        return await upload_stream(stream, folder_dir)
+
+    async def delete(self, url: str, folder_dir: str) -> None:
+        from .cloudinary import delete_file
+
+        await delete_file(url, folder_dir)
+
+
+class LocalStorage:
+    """Filesystem stand-in for cloudinary, used for tests and offline work.
+
+    Files are served back by the app under `base_url` (see src/main.py).
+    """
+
+    def __init__(self, root_dir: str, base_url: str):
+        self.root_dir = Path(root_dir)
+        self.base_url = base_url.rstrip("/")
+
+    def _write(self, stream: BinaryIO, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as file:
+            shutil.copyfileobj(stream, file)
+
+    async def upload(self, stream: BinaryIO, folder_dir: str) -> str:
+        try:
+            name = uuid.uuid4().hex
+            await asyncio.to_thread(
+                self._write, stream, self.root_dir / folder_dir / name
+            )
+            return f"{self.base_url}/{folder_dir}/{name}"
+        except Exception as e:
+            print(f"Error while uploading file: {e}")
+            raise InterServerException()
+
+    async def delete(self, url: str, folder_dir: str) -> None:
+        try:
+            path = self.root_dir / folder_dir / url.split("/")[-1]
+            await asyncio.to_thread(path.unlink, True)
+        except Exception as e:
+            print(f"Error while deleting file: {e}")
+            raise InterServerException()
+
+
+if Config.STORAGE_BACKEND == "local":
+    storage = LocalStorage(Config.LOCAL_STORAGE_DIR, Config.LOCAL_STORAGE_BASE_URL)
+else:
+    storage = CloudinaryStorage()
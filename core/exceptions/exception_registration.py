@@ -37,6 +37,15 @@ def register_exception_handlers(app: FastAPI) -> None:
             },
         ),
     )
+    app.add_exception_handler(
+        ServerBusy,
+        create_exception_handler(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail={
+                "message": "Server is busy please try again later",
+            },
+        ),
+    )
     app.add_exception_handler(
         UserNotFound,
         create_exception_handler(
@@ -163,3 +172,48 @@ def register_exception_handlers(app: FastAPI) -> None:
             },
         ),
     )
+    app.add_exception_handler(
+        InvalidCursor,
+        create_exception_handler(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                "message": "Invalid pagination cursor",
+            },
+        ),
+    )
+    app.add_exception_handler(
+        UploadNotFound,
+        create_exception_handler(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={
+                "message": "Upload not found",
+            },
+        ),
+    )
+    app.add_exception_handler(
+        UploadOffsetMismatch,
+        create_exception_handler(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={
+                "message": "Chunk offset does not match, resume from the received offset",
+            },
+        ),
+    )
+    app.add_exception_handler(
+        UploadTooLarge,
+        create_exception_handler(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail={
+                "message": "Upload is too large",
+            },
+        ),
+    )
+    app.add_exception_handler(
+        UploadIncomplete,
+        create_exception_handler(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={
+                "message": "Upload is incomplete or its content hash does not match",
+            },
+        ),
+    )
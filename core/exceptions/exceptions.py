@@ -6,6 +6,10 @@ class InterServerException(AppException):
     """This is the error generated by the server"""
 
 
+class ServerBusy(AppException):
+    """Server is overloaded and can't take more work right now"""
+
+
 # auths
 class UserAlreadyExist(AppException):
     """User is already exist in database with same email"""
@@ -61,3 +65,23 @@ class TagAlreadyExist(AppException):
 
 class PostNotFound(AppException):
     """Will get when try to get unavailable post"""
+
+
+class InvalidCursor(AppException):
+    """Client sent a pagination cursor we didn't issue"""
+
+
+class UploadNotFound(AppException):
+    """Upload session does not exist, expired or belongs to someone else"""
+
+
+class UploadOffsetMismatch(AppException):
+    """Chunk does not start where the upload currently ends"""
+
+
+class UploadTooLarge(AppException):
+    """Upload or chunk is bigger than allowed"""
+
+
+class UploadIncomplete(AppException):
+    """Upload is used before all of its bytes arrived or its hash is wrong"""
@@ -2,8 +2,9 @@ from pydantic import BaseModel, Field
 
 from uuid import UUID
 from datetime import date, datetime
+from typing import Generic, TypeVar
 
-from .utils.enums import GenderEnum
+from .utils.enums import GenderEnum, PostStatusEnum
 
 
 # we are storing all the main model of the feature
@@ -12,18 +13,35 @@ class GeneralResponseModel(BaseModel):
     message: str
 
 
+T = TypeVar("T")
+
+
+class PageModel(BaseModel, Generic[T]):
+    items: list[T]
+    # None when this is the last page
+    next_cursor: str | None = None
+
+
+class UserCardModel(BaseModel):
+    uid: UUID
+    username: str
+    full_name: str
+    profile_url: str
+
+
 class UserModel(BaseModel):
     uid: UUID
     full_name: str
     email: str
     gender: GenderEnum
     profile_url: str
+    profile_renditions: dict[str, str] | None = None
     dob: date
     about: str
     username: str
-    posts: list["PostModel"]
-    following: list["UserModel"]
-    followers: list["UserModel"]
+    posts_count: int
+    following_count: int
+    followers_count: int
     created_at: datetime
     updated_at: datetime
 
@@ -37,6 +55,9 @@ class TagModel(BaseModel):
 class PostModel(BaseModel):
     uid: UUID
     caption: str
+    post_image_url: str | None
+    image_renditions: dict[str, str] | None = None
+    status: PostStatusEnum
     tags: list["TagModel"]
     user_uid: UUID
     # user: "UserModel" = Field(exclude=True) because of recursive loop
@@ -47,6 +68,27 @@ class PostModel(BaseModel):
     updated_at: datetime
 
 
+class PostSummaryModel(BaseModel):
+    uid: UUID
+    caption: str
+    post_image_url: str | None
+    image_renditions: dict[str, str] | None = None
+    status: PostStatusEnum
+    user_uid: UUID
+    likes_count: int
+    comments_count: int
+    shares_count: int
+    created_at: datetime
+
+
+class PostDetailModel(PostSummaryModel):
+    tags: list["TagModel"]
+    liked_by_me: bool
+    # newest first, the others are read page by page
+    latest_comments: list["CommentModel"]
+    updated_at: datetime
+
+
 class ShareModel(BaseModel):
     uid: UUID
     sharer_uid: UUID
@@ -5,3 +5,25 @@ class GenderEnum(str, Enum):
     male = "male"
     female = "female"
     other = "other"
+
+
+class UserLoadProfile(str, Enum):
+    # only the columns needed to authenticate and reference the user
+    identity = "identity"
+    # every scalar column but none of the relationships
+    card = "card"
+    # scalar columns plus followers, following and posts
+    full = "full"
+
+
+class PostLoadProfile(str, Enum):
+    # the post row alone
+    bare = "bare"
+    # the post with its tags, likes, shares and comments
+    full = "full"
+
+
+class PostStatusEnum(str, Enum):
+    processing = "processing"
+    ready = "ready"
+    failed = "failed"
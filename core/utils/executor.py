@@ -0,0 +1,112 @@
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Literal
+
+import asyncio
+import time
+
+from core.exceptions.exceptions import ServerBusy
+
+
+class BoundedExecutor:
+    """Run blocking work off the event loop with a cap on pending jobs.
+
+    At most `max_pending` jobs are submitted or running at the same time. A new
+    job waits up to `queue_timeout` seconds for a free slot and is rejected with
+    ServerBusy after that, so a burst can't pile up unbounded work in the pool.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        kind: Literal["process", "thread"] = "process",
+        max_workers: int | None = None,
+        max_pending: int = 32,
+        queue_timeout: float = 2.0,
+    ):
+        self.name = name
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+        self._executor: Executor | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+        self._pending = 0
+
+        # metrics
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._total_wait_seconds = 0.0
+        self._total_run_seconds = 0.0
+        self._max_run_seconds = 0.0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix=self.name,
+                )
+        return self._executor
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_pending)
+        return self._semaphore
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        semaphore = self._get_semaphore()
+        wait_start = time.perf_counter()
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._rejected += 1
+            raise ServerBusy()
+
+        self._pending += 1
+        self._submitted += 1
+        run_start = time.perf_counter()
+        self._total_wait_seconds += run_start - wait_start
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._get_executor(), func, *args)
+            self._completed += 1
+            return result
+        except Exception:
+            self._failed += 1
+            raise
+        finally:
+            run_seconds = time.perf_counter() - run_start
+            self._total_run_seconds += run_seconds
+            self._max_run_seconds = max(self._max_run_seconds, run_seconds)
+            self._pending -= 1
+            semaphore.release()
+
+    def metrics(self) -> dict:
+        finished = self._completed + self._failed
+        return {
+            "kind": self.kind,
+            "pending": self._pending,
+            "max_pending": self.max_pending,
+            "submitted": self._submitted,
+            "completed": self._completed,
+            "failed": self._failed,
+            "rejected": self._rejected,
+            "avg_wait_ms": (
+                self._total_wait_seconds / self._submitted * 1000
+                if self._submitted
+                else 0.0
+            ),
+            "avg_run_ms": (
+                self._total_run_seconds / finished * 1000 if finished else 0.0
+            ),
+            "max_run_ms": self._max_run_seconds * 1000,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
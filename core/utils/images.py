@@ -0,0 +1,48 @@
+from PIL import Image, ImageOps
+
+import io
+
+from core.utils.executor import BoundedExecutor
+from core.utils.metrics import register_metrics
+from src.config import Config
+
+# longest side of every rendition, images are only ever scaled down
+RENDITION_SIZES = {
+    "thumbnail": 150,
+    "feed": 640,
+    "full": 1440,
+}
+WEBP_QUALITY = 80
+
+
+def render_renditions(data: bytes) -> dict[str, bytes]:
+    """resize the image to every rendition and encode them as webp.
+
+    Runs inside the process pool, the exif block is dropped because it is
+    never passed to save, the orientation is applied to the pixels first.
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        image = image.convert("RGBA" if image.has_transparency_data else "RGB")
+        renditions = {}
+        for name, size in RENDITION_SIZES.items():
+            rendition = image.copy()
+            rendition.thumbnail((size, size), Image.Resampling.LANCZOS)
+            output = io.BytesIO()
+            rendition.save(output, format="WEBP", quality=WEBP_QUALITY)
+            renditions[name] = output.getvalue()
+        return renditions
+
+
+image_executor = BoundedExecutor(
+    name="images",
+    kind="process",
+    max_workers=Config.IMAGE_WORKERS,
+    max_pending=Config.IMAGE_MAX_PENDING,
+    queue_timeout=Config.IMAGE_QUEUE_TIMEOUT,
+)
+register_metrics("images", image_executor.metrics)
+
+
+async def create_renditions(data: bytes) -> dict[str, bytes]:
+    return await image_executor.run(render_renditions, data)
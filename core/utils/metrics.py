@@ -0,0 +1,41 @@
+from fastapi import Depends
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+
+import secrets
+from typing import Annotated, Callable
+
+from src.config import Config
+from core.exceptions.exceptions import InvalidToken, UnAuthenticated
+
+# every subsystem that keeps counters registers a collector here and the
+# /metrics endpoint reads them all, this keeps metrics in process and cheap
+_collectors: dict[str, Callable[[], dict]] = {}
+
+
+def register_metrics(name: str, collector: Callable[[], dict]) -> None:
+    _collectors[name] = collector
+
+
+def collect_metrics() -> dict:
+    metrics = {}
+    for name, collector in _collectors.items():
+        try:
+            metrics[name] = collector()
+        except Exception as e:
+            print(f"Error while collecting {name} metrics: {e}")
+    return metrics
+
+
+metrics_bearer = HTTPBearer(auto_error=False)
+
+
+async def verify_metrics_token(
+    creds: Annotated[HTTPAuthorizationCredentials | None, Depends(metrics_bearer)],
+) -> None:
+    """the metrics show internals, only scrapers holding METRICS_TOKEN get them"""
+    if creds is None:
+        raise UnAuthenticated()
+    if not secrets.compare_digest(
+        creds.credentials.encode(), Config.METRICS_TOKEN.encode()
+    ):
+        raise InvalidToken()
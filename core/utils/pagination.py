@@ -0,0 +1,31 @@
+import base64
+import json
+from typing import Any, Callable
+
+from core.exceptions.exceptions import InvalidCursor
+
+
+# cursors are opaque to the client, they only carry the keyset values of the
+# last item of a page so the next page can continue right after it
+def encode_cursor(values: list) -> str:
+    data = json.dumps([str(value) for value in values]).encode()
+    return base64.urlsafe_b64encode(data).decode()
+
+
+def decode_cursor(cursor: str, *converters: Callable[[str], Any]) -> list:
+    """the values of the cursor, each passed through its converter, e.g.
+    decode_cursor(cursor, datetime.fromisoformat, UUID)"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise InvalidCursor()
+    if not isinstance(values, list) or len(values) != len(converters):
+        raise InvalidCursor()
+    try:
+        return [convert(value) for convert, value in zip(converters, values)]
+    except Exception:
+        raise InvalidCursor()
+
+
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
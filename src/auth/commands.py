@@ -0,0 +1,83 @@
+from sqlmodel import select
+from sqlalchemy import func, or_, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+import asyncio
+
+from core.database.main import Session
+from core.database.models import User, UserLinkModel, Post
+
+BATCH_SIZE = 1000
+
+
+async def reconcile_user_counters(
+    session: AsyncSession, batch_size: int = BATCH_SIZE
+) -> int:
+    """recompute followers, following and posts counters from the real rows.
+
+    Users are walked in uid order and fixed one batch per transaction so the
+    users table is never locked as a whole. Returns how many users were off.
+    """
+    followers_count = (
+        select(func.count())
+        .select_from(UserLinkModel)
+        .where(UserLinkModel.user_uid == User.uid)
+        .scalar_subquery()
+    )
+    following_count = (
+        select(func.count())
+        .select_from(UserLinkModel)
+        .where(UserLinkModel.follower_uid == User.uid)
+        .scalar_subquery()
+    )
+    posts_count = (
+        select(func.count())
+        .select_from(Post)
+        .where(Post.user_uid == User.uid)
+        .scalar_subquery()
+    )
+
+    fixed = 0
+    last_uid = None
+    while True:
+        batch_statement = select(User.uid).order_by(User.uid).limit(batch_size)
+        if last_uid is not None:
+            batch_statement = batch_statement.where(User.uid > last_uid)
+        result = await session.exec(batch_statement)
+        uids = result.all()
+        if not uids:
+            break
+        last_uid = uids[-1]
+
+        statement = (
+            update(User)
+            .where(
+                User.uid.in_(uids),
+                or_(
+                    User.followers_count != followers_count,
+                    User.following_count != following_count,
+                    User.posts_count != posts_count,
+                ),
+            )
+            .values(
+                followers_count=followers_count,
+                following_count=following_count,
+                posts_count=posts_count,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        result = await session.exec(statement)
+        fixed += result.rowcount
+        await session.commit()
+    return fixed
+
+
+async def main() -> None:
+    async with Session() as session:
+        fixed = await reconcile_user_counters(session)
+    print(f"reconciled counters of {fixed} users")
+
+
+if __name__ == "__main__":
+    # python -m src.auth.commands
+    asyncio.run(main())
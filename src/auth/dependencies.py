@@ -1,7 +1,18 @@
+from fastapi import Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.requests import Request
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from .utils import decode_jwt_token
+from typing import Annotated, AsyncGenerator, Any
+from uuid import UUID
+
+from .utils import decode_jwt_token, get_principal_cache_key
+from .revocation import revocation_list
+from .schemas import PrincipalModel
+from .service import auth_service
+from core.database.main import get_session, create_read_session
+from core.database.redis import get_data_from_redis, put_data_in_redis
+from core.utils.enums import UserLoadProfile
 from core.exceptions.exceptions import (
     InvalidToken,
     RefreshTokenRequired,
@@ -27,6 +38,8 @@ class JWTTokenBearer(HTTPBearer):
             raise InvalidToken()
 
         self.verify_token_data(token_data)
+        if await revocation_list.is_revoked(token_data):
+            raise InvalidToken()
         return token_data
 
     def verify_token_data(self, _: dict):
@@ -47,3 +60,54 @@ class RefreshTokenBearer(JWTTokenBearer):
 
 access_token_bearer = AccessTokenBearer()
 refresh_token_bearer = RefreshTokenBearer()
+
+
+PRINCIPAL_CACHE_SECONDS = 300
+
+
+async def get_user_session(
+    token_data: Annotated[dict, Depends(access_token_bearer)],
+    session: Annotated[AsyncSession, Depends(get_session)],
+) -> AsyncSession:
+    """the session of the request tagged with its caller, the writes it
+    commits keep the caller on the primary for a while"""
+    session.info["user_uid"] = token_data["user_data"]["uid"]
+    return session
+
+
+async def get_current_principal(
+    token_data: Annotated[dict, Depends(access_token_bearer)],
+    session: Annotated[AsyncSession, Depends(get_user_session)],
+) -> PrincipalModel:
+    """resolve the caller of the request.
+
+    FastAPI caches a dependency for the whole request, so every route and
+    service call that depends on this shares one principal. The identity record
+    is cached in redis so most requests don't touch the database at all.
+    """
+    uid = token_data["user_data"]["uid"]
+    cache_key = get_principal_cache_key(uid)
+    cached_principal = await get_data_from_redis(cache_key)
+    if cached_principal is not None:
+        return PrincipalModel.model_validate_json(cached_principal)
+
+    user = await auth_service.get_user_by_uid(
+        UUID(uid), session, UserLoadProfile.identity
+    )
+    if user is None:
+        raise InvalidToken()
+    principal = PrincipalModel.model_validate(user, from_attributes=True)
+    await put_data_in_redis(
+        cache_key,
+        principal.model_dump_json(),
+        expire_in_second=PRINCIPAL_CACHE_SECONDS,
+    )
+    return principal
+
+
+async def get_read_session(
+    token_data: Annotated[dict, Depends(access_token_bearer)],
+) -> AsyncGenerator[Any, AsyncSession]:
+    """session for read only endpoints, served by a replica when there is one"""
+    async with await create_read_session(token_data["user_data"]["uid"]) as session:
+        yield session
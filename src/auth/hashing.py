@@ -0,0 +1,25 @@
+from core.utils.executor import BoundedExecutor
+from core.utils.metrics import register_metrics
+from src.config import Config
+from . import utils
+
+# argon2 is cpu bound and takes tens of milliseconds, running it on the event
+# loop stalls every other request of the worker
+hashing_executor = BoundedExecutor(
+    name="hashing",
+    kind=Config.HASHING_EXECUTOR,
+    max_workers=Config.HASHING_WORKERS,
+    max_pending=Config.HASHING_MAX_PENDING,
+    queue_timeout=Config.HASHING_QUEUE_TIMEOUT,
+)
+register_metrics("hashing", hashing_executor.metrics)
+
+
+async def hash_password(password: str) -> str:
+    return await hashing_executor.run(utils.hash_password, password)
+
+
+async def verify_hashed_password(password: str, hashed_password: str) -> bool:
+    return await hashing_executor.run(
+        utils.verify_hashed_password, password, hashed_password
+    )
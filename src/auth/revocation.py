@@ -0,0 +1,155 @@
+from datetime import datetime, timezone
+
+import asyncio
+
+from core.database.redis import redis
+from core.exceptions.exceptions import InterServerException
+from core.utils.bloom import BloomFilter
+from core.utils.metrics import register_metrics
+from src.config import Config
+
+REVOCATION_CHANNEL = "token-revocations"
+# refresh tokens live for 7 days, a user wide revocation must outlive them
+USER_REVOCATION_SECONDS = 7 * 24 * 60 * 60
+
+
+def get_revocation_key(member: str) -> str:
+    return f"revoked:{member}"
+
+
+class TokenRevocationList:
+    """Redis denylist of revoked tokens with an in process bloom filter front.
+
+    Members are `token:<jti>` for a single token and `user:<uid>` for every
+    token of a user issued before the revocation. Every worker keeps the same
+    bloom filter through pub/sub, so the common "not revoked" answer needs no
+    network round trip and only bloom hits are confirmed in redis. Members
+    can't be removed from a bloom filter, so it is rebuilt periodically from
+    the revocations redis still holds, their keys expire on their own.
+    """
+
+    def __init__(self, capacity: int, error_rate: float, rebuild_seconds: int):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.rebuild_seconds = rebuild_seconds
+        self._bloom = BloomFilter(capacity=capacity, error_rate=error_rate)
+        # members revoked while a rebuild is scanning redis
+        self._revoked_during_load: list[str] | None = None
+        self._rebuilds = 0
+        self._checks = 0
+        self._redis_checks = 0
+        self._revoked_hits = 0
+
+    async def _revoke(self, member: str, value: str, expire_in_second: int) -> None:
+        try:
+            await redis.set(get_revocation_key(member), value, ex=expire_in_second)
+            self._add(member)
+            await redis.publish(REVOCATION_CHANNEL, member)
+        except Exception as e:
+            print(f"Error while revoking token: {e}")
+            raise InterServerException()
+
+    async def revoke_token(self, token_data: dict) -> None:
+        jti = token_data.get("jti")
+        if jti is None:
+            return None
+        remaining_seconds = int(
+            token_data["exp"] - datetime.now(timezone.utc).timestamp()
+        )
+        if remaining_seconds <= 0:
+            return None
+        await self._revoke(f"token:{jti}", "1", remaining_seconds)
+
+    async def revoke_user_tokens(self, uid: str) -> None:
+        """revoke every token of the user issued until now"""
+        revoked_at = datetime.now(timezone.utc).timestamp()
+        await self._revoke(f"user:{uid}", str(revoked_at), USER_REVOCATION_SECONDS)
+
+    async def is_revoked(self, token_data: dict) -> bool:
+        self._checks += 1
+        token_member = f"token:{token_data.get('jti')}"
+        user_member = f"user:{token_data['user_data']['uid']}"
+        if token_member not in self._bloom and user_member not in self._bloom:
+            return False
+
+        self._redis_checks += 1
+        try:
+            token_revoked, user_revoked_at = await redis.mget(
+                get_revocation_key(token_member),
+                get_revocation_key(user_member),
+            )
+        except Exception as e:
+            print(f"Error while checking token revocation: {e}")
+            raise InterServerException()
+
+        revoked = token_revoked is not None or (
+            user_revoked_at is not None
+            and token_data.get("iat", 0) <= float(user_revoked_at)
+        )
+        if revoked:
+            self._revoked_hits += 1
+        return revoked
+
+    def _add(self, member: str) -> None:
+        self._bloom.add(member)
+        if self._revoked_during_load is not None:
+            self._revoked_during_load.append(member)
+
+    async def load(self) -> None:
+        """rebuild the bloom filter from every revocation still in redis. The
+        new filter replaces the old one once complete, so checks never see a
+        partly filled filter"""
+        bloom = BloomFilter(capacity=self.capacity, error_rate=self.error_rate)
+        self._revoked_during_load = []
+        try:
+            async for key in redis.scan_iter(match=get_revocation_key("*")):
+                bloom.add(key.decode().removeprefix(get_revocation_key("")))
+            # the scan may have passed them already
+            for member in self._revoked_during_load:
+                bloom.add(member)
+            self._bloom = bloom
+            self._rebuilds += 1
+        finally:
+            self._revoked_during_load = None
+
+    async def rebuild_periodically(self) -> None:
+        """drop the expired revocations from the filter before it fills up"""
+        while True:
+            await asyncio.sleep(self.rebuild_seconds)
+            try:
+                await self.load()
+            except Exception as e:
+                print(f"Error while rebuilding token revocations: {e}")
+
+    async def listen(self) -> None:
+        """keep the bloom filter in sync with revocations of other workers"""
+        while True:
+            try:
+                async with redis.pubsub() as pubsub:
+                    await pubsub.subscribe(REVOCATION_CHANNEL)
+                    # reload after subscribing so nothing is missed in between
+                    await self.load()
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self._add(message["data"].decode())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error while listening for token revocations: {e}")
+                await asyncio.sleep(1)
+
+    def metrics(self) -> dict:
+        return {
+            "checks": self._checks,
+            "redis_checks": self._redis_checks,
+            "revoked_hits": self._revoked_hits,
+            "rebuilds": self._rebuilds,
+        }
+
+
+revocation_list = TokenRevocationList(
+    capacity=Config.TOKEN_REVOCATION_CAPACITY,
+    error_rate=Config.TOKEN_REVOCATION_ERROR_RATE,
+    rebuild_seconds=Config.TOKEN_REVOCATION_REBUILD_SECONDS,
+)
+register_metrics("token_revocation", revocation_list.metrics)
@@ -14,6 +14,7 @@ from pydantic import EmailStr
 
 from datetime import date
 from typing import Annotated
+from uuid import UUID
 
 from .schemas import (
     CreteUserModel,
@@ -23,12 +24,24 @@ from .schemas import (
     ChangePasswordModel,
     UpdateDataModel,
     UpdatePasswordModel,
+    PrincipalModel,
+    LogoutModel,
 )
 from .service import auth_service
-from .dependencies import refresh_token_bearer, access_token_bearer
+from .dependencies import (
+    refresh_token_bearer,
+    access_token_bearer,
+    get_current_principal,
+    get_read_session,
+)
 from core.database.main import get_session
 from core.utils.enums import GenderEnum
-from core.schemas import GeneralResponseModel, UserModel
+from core.schemas import (
+    GeneralResponseModel,
+    UserModel,
+    UserCardModel,
+    PageModel,
+)
 
 auth_router = APIRouter()
 
@@ -107,15 +120,25 @@ async def get_new_tokens(
     return await auth_service.get_new_tokens(user_data, session)
 
 
+@auth_router.post("/logout", response_model=GeneralResponseModel)
+async def logout(
+    logout_data: Annotated[LogoutModel, Body()],
+    token_data: Annotated[dict, Depends(access_token_bearer)],
+):
+    return await auth_service.logout(token_data, logout_data)
+
+
 @auth_router.patch("/update-profile", response_model=UserModel)
 async def get_new_tokens(
-    user_data: Annotated[dict, Depends(access_token_bearer)],
-    new_profile_file: Annotated[UploadFile, File()],
+    principal: Annotated[PrincipalModel, Depends(get_current_principal)],
     session: Annotated[AsyncSession, Depends(get_session)],
+    new_profile_file: Annotated[UploadFile | None, File()] = None,
+    upload_id: Annotated[UUID | None, Form()] = None,
 ):
     return await auth_service.update_profile(
         new_profile_file=new_profile_file,
-        user_data=user_data,
+        upload_id=upload_id,
+        principal=principal,
         session=session,
     )
 
@@ -123,61 +146,89 @@ async def get_new_tokens(
 @auth_router.patch("/update-user-data", response_model=UserModel)
 async def update_data(
     update_data: Annotated[UpdateDataModel, Body()],
-    user_data: Annotated[dict, Depends(access_token_bearer)],
+    principal: Annotated[PrincipalModel, Depends(get_current_principal)],
     session: Annotated[AsyncSession, Depends(get_session)],
 ):
-    return await auth_service.update_user_data(update_data, user_data, session)
+    return await auth_service.update_user_data(update_data, principal, session)
 
 
 @auth_router.patch("/update-password", response_model=GeneralResponseModel)
 async def update_password(
     update_password_data: Annotated[UpdatePasswordModel, Body()],
-    user_data: Annotated[dict, Depends(access_token_bearer)],
+    principal: Annotated[PrincipalModel, Depends(get_current_principal)],
     session: Annotated[AsyncSession, Depends(get_session)],
 ):
-    return await auth_service.update_password(update_password_data, user_data, session)
+    return await auth_service.update_password(update_password_data, principal, session)
 
 
-@auth_router.get("/search-users", response_model=list[UserModel])
+@auth_router.get("/search-users", response_model=PageModel[UserCardModel])
 async def search_users(
     search_key: Annotated[str, Query()],
     _: Annotated[dict, Depends(access_token_bearer)],
-    session: Annotated[AsyncSession, Depends(get_session)],
+    session: Annotated[AsyncSession, Depends(get_read_session)],
+    cursor: Annotated[str | None, Query()] = None,
+    limit: Annotated[int, Query(ge=1, le=50)] = 20,
 ):
-    return await auth_service.search_users(search_key, session)
+    return await auth_service.search_users(search_key, session, cursor, limit)
 
 
 @auth_router.get("/current-user", response_model=UserModel)
 async def get_current_user(
-    user_data: Annotated[dict, Depends(access_token_bearer)],
+    principal: Annotated[PrincipalModel, Depends(get_current_principal)],
     session: Annotated[AsyncSession, Depends(get_session)],
 ):
-    return await auth_service.get_current_user(user_data, session)
+    return await auth_service.get_current_user(principal, session)
 
 
 @auth_router.get("/follow-user", response_model=GeneralResponseModel)
 async def follow_user(
-    user_data: Annotated[dict, Depends(access_token_bearer)],
+    principal: Annotated[PrincipalModel, Depends(get_current_principal)],
     following_username: Annotated[str, Query()],
     session: Annotated[AsyncSession, Depends(get_session)],
 ):
-    return await auth_service.follow_user(user_data, following_username, session)
+    return await auth_service.follow_user(principal, following_username, session)
 
 
 @auth_router.get(
     "/unfollow-user/{un_flowing_username}", response_model=GeneralResponseModel
 )
 async def unfollow_user(
-    user_data: Annotated[dict, Depends(access_token_bearer)],
+    principal: Annotated[PrincipalModel, Depends(get_current_principal)],
     un_flowing_username: Annotated[str, Path()],
     session: Annotated[AsyncSession, Depends(get_session)],
 ):
-    return await auth_service.unfollow_user(user_data, un_flowing_username, session)
+    return await auth_service.unfollow_user(principal, un_flowing_username, session)
 
 
 @auth_router.delete("/delete-user", status_code=204)
 async def delete_user(
-    user_data: Annotated[dict, Depends(access_token_bearer)],
+    principal: Annotated[PrincipalModel, Depends(get_current_principal)],
     session: Annotated[AsyncSession, Depends(get_session)],
 ):
-    await auth_service.delete_user(user_data, session)
+    await auth_service.delete_user(principal, session)
+
+
+@auth_router.get("/{username}/followers", response_model=PageModel[UserCardModel])
+async def get_followers(
+    username: Annotated[str, Path()],
+    _: Annotated[dict, Depends(access_token_bearer)],
+    session: Annotated[AsyncSession, Depends(get_session)],
+    cursor: Annotated[str | None, Query()] = None,
+    limit: Annotated[int, Query(ge=1, le=50)] = 20,
+):
+    return await auth_service.get_follow_list(
+        username, session, followers=True, cursor=cursor, limit=limit
+    )
+
+
+@auth_router.get("/{username}/following", response_model=PageModel[UserCardModel])
+async def get_following(
+    username: Annotated[str, Path()],
+    _: Annotated[dict, Depends(access_token_bearer)],
+    session: Annotated[AsyncSession, Depends(get_session)],
+    cursor: Annotated[str | None, Query()] = None,
+    limit: Annotated[int, Query(ge=1, le=50)] = 20,
+):
+    return await auth_service.get_follow_list(
+        username, session, followers=False, cursor=cursor, limit=limit
+    )
@@ -3,6 +3,7 @@ from pydantic import BaseModel, EmailStr
 from core.utils.enums import GenderEnum
 
 from datetime import date
+from uuid import UUID
 
 
 class CreteUserModel(BaseModel):
@@ -46,6 +47,20 @@ class UpdateDataModel(BaseModel):
     new_password: str | None = None
 
 
+class LogoutModel(BaseModel):
+    refresh_token: str | None = None
+
+
 class UpdatePasswordModel(BaseModel):
     old_password: str
     new_password: str
+
+
+class PrincipalModel(BaseModel):
+    """small identity record of the authenticated caller"""
+
+    uid: UUID
+    username: str
+    full_name: str
+    email: str
+    profile_url: str
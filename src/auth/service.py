@@ -1,12 +1,13 @@
 from fastapi import BackgroundTasks, UploadFile
 from sqlmodel import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy import Numeric, case, cast, delete, func, or_, tuple_, update
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from sqlalchemy.exc import IntegrityError
 
 from datetime import timedelta, datetime
-from uuid import UUID
+from decimal import Decimal
+from uuid import UUID, uuid4
 
 from .schemas import (
     CreteUserModel,
@@ -15,23 +16,40 @@ from .schemas import (
     ChangePasswordModel,
     UpdateDataModel,
     UpdatePasswordModel,
+    PrincipalModel,
+    LogoutModel,
 )
 from .utils import (
-    hash_password,
-    verify_hashed_password,
     generate_otp,
     create_jwt_token,
+    decode_jwt_token,
+    get_principal_cache_key,
 )
-
-
-from core.database.models import User, UserLinkModel
-from core.database.cloudinary import upload_file, delete_file
+from .revocation import revocation_list
+from .hashing import hash_password, verify_hashed_password
+
+
+from core.database.models import (
+    User,
+    UserLinkModel,
+    Post,
+    TagAndPostLinkModel,
+    Like,
+    Comment,
+    Share,
+)
+from core.database.loaders import get_load_options
 from core.database.redis import (
     put_data_in_redis,
     get_data_from_redis,
     delete_data_from_redis,
 )
 from core.utils.mail import send_mail
+from src.post.media import media_pipeline, MediaJob, get_profile_path
+from src.upload.service import upload_service
+from src.feed.service import feed_service
+from core.utils.enums import UserLoadProfile
+from core.utils.pagination import encode_cursor, decode_cursor, escape_like
 from core.exceptions.exceptions import (
     UserAlreadyExist,
     UserNameAlreadyTaken,
@@ -40,24 +58,28 @@ from core.exceptions.exceptions import (
     InvalidOTP,
     InvalidCredentials,
     InvalidToken,
+    ExpiredToken,
     InvalidOperation,
     AlreadyFollowed,
+    InvalidCursor,
+    UploadNotFound,
+    UploadIncomplete,
+    ServerBusy,
 )
 
 
-def get_profile_path(full_name: str):
-    return f"users/{full_name}/profiles"
-
-
 class AuthService:
-    async def get_user_by_email(self, email: str, session: AsyncSession) -> User | None:
+    async def get_user_by_email(
+        self,
+        email: str,
+        session: AsyncSession,
+        profile: UserLoadProfile = UserLoadProfile.full,
+    ) -> User | None:
         try:
             statement = (
                 select(User)
                 .where(User.email == email)
-                .options(selectinload(User.followers))
-                .options(selectinload(User.following))
-                .options(selectinload(User.posts))
+                .options(*get_load_options(User, profile))
             )
 
             user = await session.exec(statement=statement)
@@ -67,15 +89,34 @@ class AuthService:
             raise InterServerException()
 
     async def get_user_by_username(
-        self, username: str, session: AsyncSession
+        self,
+        username: str,
+        session: AsyncSession,
+        profile: UserLoadProfile = UserLoadProfile.full,
     ) -> User | None:
         try:
             statement = (
                 select(User)
                 .where(User.username == username)
-                .options(selectinload(User.followers))
-                .options(selectinload(User.following))
-                .options(selectinload(User.posts))
+                .options(*get_load_options(User, profile))
+            )
+            user = await session.exec(statement=statement)
+            return user.first()
+        except Exception as e:
+            print(e)
+            raise InterServerException()
+
+    async def get_user_by_uid(
+        self,
+        uid: UUID,
+        session: AsyncSession,
+        profile: UserLoadProfile = UserLoadProfile.full,
+    ) -> User | None:
+        try:
+            statement = (
+                select(User)
+                .where(User.uid == uid)
+                .options(*get_load_options(User, profile))
             )
             user = await session.exec(statement=statement)
             return user.first()
@@ -87,7 +128,9 @@ class AuthService:
         self, email: str, session: AsyncSession
     ) -> bool:
         try:
-            user = await self.get_user_by_email(email, session)
+            user = await self.get_user_by_email(
+                email, session, UserLoadProfile.identity
+            )
             return user is not None
         except Exception as e:
             print(e)
@@ -99,27 +142,33 @@ class AuthService:
         session: AsyncSession,
         background_task: BackgroundTasks,
     ) -> User:
-
+        user_uid = uuid4()
+        # the profile picture is processed and uploaded by the media pipeline,
+        # until then the user has the default picture
+        spool_uid = uuid4()
+        committed = False
         try:
             # check if user exist
-            user: User = await self.get_user_by_email(user_data.email, session=session)
+            user: User = await self.get_user_by_email(
+                user_data.email, session, UserLoadProfile.identity
+            )
             if user:
                 raise UserAlreadyExist()
             # check if user with same username exist
-            user = await self.get_user_by_username(user_data.username, session)
+            user = await self.get_user_by_username(
+                user_data.username, session, UserLoadProfile.identity
+            )
             if user:
                 raise UserNameAlreadyTaken()
             # creating a user
-            new_user = User(**user_data.model_dump())
+            new_user = User(uid=user_uid, **user_data.model_dump())
 
             # hash user password
-            new_user.hashed_password = hash_password(user_data.password)
+            new_user.hashed_password = await hash_password(user_data.password)
+
+            # spooled before the commit, the client can retry a failed spool
+            await media_pipeline.spool(user_data.profile_file, user_uid, spool_uid)
 
-            # upload file to the cloudinary
-            new_user.profile_url = await upload_file(
-                user_data.profile_file,
-                get_profile_path(new_user.full_name),
-            )
             otp_code = generate_otp()
 
             # save opt in redis
@@ -128,8 +177,22 @@ class AuthService:
             # adding data to database
             session.add(new_user)
             await session.commit()
+            committed = True
             await session.refresh(new_user)
 
+            try:
+                media_pipeline.submit(
+                    MediaJob(
+                        target="profile",
+                        target_uid=user_uid,
+                        spool_uid=spool_uid,
+                        folder_dir=get_profile_path(new_user.full_name),
+                    )
+                )
+            except ServerBusy:
+                # the account exists, it keeps the default picture
+                await media_pipeline.discard(user_uid, spool_uid)
+
             # send otp code to user email for verification
             background_task.add_task(
                 send_mail,
@@ -138,17 +201,21 @@ class AuthService:
                 f"Hey welcome to our app <br> your otp code is: <b>{otp_code}</b>.<br>Don't share to any one",
             )
             return new_user
-        except (UserAlreadyExist, UserNameAlreadyTaken):
+        except (UserAlreadyExist, UserNameAlreadyTaken, ServerBusy):
             raise
         except Exception as e:
             print(e)
+            if not committed:
+                await media_pipeline.discard(user_uid, spool_uid)
             raise InterServerException()
 
     async def verify_otp(
         self, otp_verification_data: VerifyOTPDataModel, session: AsyncSession
     ) -> dict:
         try:
-            user = await self.get_user_by_email(otp_verification_data.email, session)
+            user = await self.get_user_by_email(
+                otp_verification_data.email, session, UserLoadProfile.identity
+            )
             if not user:
                 raise UserNotFound()
 
@@ -167,10 +234,14 @@ class AuthService:
     async def login(self, login_data: LoginDataModel, session: AsyncSession) -> dict:
         try:
 
-            user = await self.get_user_by_email(login_data.email, session)
+            user = await self.get_user_by_email(
+                login_data.email, session, UserLoadProfile.identity
+            )
             if not user:
                 raise InvalidCredentials()
-            if not verify_hashed_password(login_data.password, user.hashed_password):
+            if not await verify_hashed_password(
+                login_data.password, user.hashed_password
+            ):
                 raise InvalidCredentials()
             data = {
                 "uid": str(user.uid),
@@ -187,7 +258,7 @@ class AuthService:
                 "access_token": access_token,
                 "refresh_token": refresh_token,
             }
-        except InvalidCredentials:
+        except (InvalidCredentials, ServerBusy):
             raise
         except Exception as e:
             print(e)
@@ -201,7 +272,9 @@ class AuthService:
     ) -> dict:
 
         try:
-            user = await self.get_user_by_email(email, session)
+            user = await self.get_user_by_email(
+                email, session, UserLoadProfile.identity
+            )
             if not user:
                 raise UserNotFound()
             otp = generate_otp()
@@ -224,17 +297,17 @@ class AuthService:
     ) -> User:
         try:
             user: User | None = await self.get_user_by_email(
-                password_change_data.email, session
+                password_change_data.email, session, UserLoadProfile.card
             )
             if user is None:
                 raise UserNotFound()  # not needed but for safety
-            new_hash_password = hash_password(password_change_data.new_password)
+            new_hash_password = await hash_password(password_change_data.new_password)
             user.hashed_password = new_hash_password
             await session.commit()
-            await session.refresh(user)
+            await revocation_list.revoke_user_tokens(str(user.uid))
             return user
 
-        except UserNotFound:
+        except (UserNotFound, ServerBusy):
             raise
         except Exception as e:
             print(e)
@@ -245,7 +318,9 @@ class AuthService:
             user_email = user_data["user_data"]["username"]
             if not user_email:
                 raise InvalidToken()
-            user = await self.get_user_by_username(user_email, session)
+            user = await self.get_user_by_username(
+                user_email, session, UserLoadProfile.identity
+            )
             if not user:
                 raise InvalidToken()
             data = {
@@ -270,27 +345,64 @@ class AuthService:
             print(e)
             raise InterServerException()
 
+    async def logout(self, token_data: dict, logout_data: LogoutModel) -> dict:
+        try:
+            await revocation_list.revoke_token(token_data)
+            if logout_data.refresh_token:
+                try:
+                    refresh_token_data = decode_jwt_token(logout_data.refresh_token)
+                except ExpiredToken:
+                    # an expired refresh token is useless anyway
+                    refresh_token_data = None
+                if refresh_token_data is not None:
+                    if (
+                        refresh_token_data["user_data"]["uid"]
+                        != token_data["user_data"]["uid"]
+                    ):
+                        raise InvalidToken()
+                    await revocation_list.revoke_token(refresh_token_data)
+            return {"message": "logged out successfully"}
+        except InvalidToken:
+            raise
+        except Exception as e:
+            print(e)
+            raise InterServerException()
+
     async def update_profile(
-        self, user_data: dict, new_profile_file: UploadFile, session: AsyncSession
+        self,
+        principal: PrincipalModel,
+        new_profile_file: UploadFile | None,
+        session: AsyncSession,
+        upload_id: UUID | None = None,
     ) -> User:
         try:
-            username = user_data["user_data"]["username"]
-            user = await self.get_user_by_username(username, session)
+            user = await self.get_user_by_uid(
+                principal.uid, session, UserLoadProfile.card
+            )
             if user is None:
                 raise UserNotFound()
-            # delete user old profile
-            profile_folder = get_profile_path(user.full_name)
-            await delete_file(
-                user.profile_url,
-                profile_folder,
-            )
-            new_profile_url = await upload_file(new_profile_file, profile_folder)
-            user.profile_url = new_profile_url
+            # every update has its own spool file, the picture stored before
+            # it is deleted once the new one is stored
+            spool_uid = uuid4()
+            await upload_service.spool_image(
+                user.uid, user.uid, new_profile_file, upload_id, spool_uid
+            )
             user.updated_at = datetime.now()
             await session.commit()
-            await session.refresh(user)
+            media_pipeline.submit(
+                MediaJob(
+                    target="profile",
+                    target_uid=user.uid,
+                    spool_uid=spool_uid,
+                    folder_dir=get_profile_path(user.full_name),
+                )
+            )
             return user
-        except UserNotFound:
+        except (UserNotFound, InvalidOperation, UploadNotFound, UploadIncomplete):
+            raise
+        except ServerBusy:
+            # the picture stays as it is, the client tries again later
+            await media_pipeline.discard(user.uid, spool_uid)
             raise
         except Exception as e:
             print(e)
@@ -299,12 +411,13 @@ class AuthService:
     async def update_user_data(
         self,
         update_data: UpdateDataModel,
-        user_data: dict,
+        principal: PrincipalModel,
         session: AsyncSession,
     ):
         try:
-            username = user_data["user_data"]["username"]
-            user = await self.get_user_by_username(username, session)
+            user = await self.get_user_by_uid(
+                principal.uid, session, UserLoadProfile.card
+            )
             if not user:
                 raise InvalidToken()
             # looping though all the element got form request
@@ -313,13 +426,15 @@ class AuthService:
                 if v is not None and getattr(user, k) != v:
                     # special check for username
                     if k == "username":
-                        if await self.get_user_by_username(v, session):
+                        if await self.get_user_by_username(
+                            v, session, UserLoadProfile.identity
+                        ):
                             raise UserNameAlreadyTaken()
                     # replacing value if change
                     setattr(user, k, v)
                     user.updated_at = datetime.now()
                     await session.commit()
-                    await session.refresh(user)
+            await delete_data_from_redis(get_principal_cache_key(user.uid))
             return user
 
         except (InvalidToken, UserNameAlreadyTaken):
@@ -331,52 +446,108 @@ class AuthService:
     async def update_password(
         self,
         update_password_data: UpdatePasswordModel,
-        user_data: dict,
+        principal: PrincipalModel,
         session: AsyncSession,
     ):
         try:
-            username = user_data["user_data"]["username"]
-            user: User = await self.get_user_by_username(username, session)
-            if not User:
+            user: User = await self.get_user_by_uid(
+                principal.uid, session, UserLoadProfile.identity
+            )
+            if not user:
                 raise InvalidToken()
-            if not verify_hashed_password(
+            if not await verify_hashed_password(
                 update_password_data.old_password, user.hashed_password
             ):
                 raise InvalidCredentials()
-            new_password_hashed = hash_password(update_password_data.new_password)
-            if verify_hashed_password(
-                update_password_data.new_password, user.hashed_password
-            ):
+            if update_password_data.new_password == update_password_data.old_password:
                 return {"message": "Same password no need to change"}
-            user.hashed_password = new_password_hashed
+            user.hashed_password = await hash_password(
+                update_password_data.new_password
+            )
             user.updated_at = datetime.now()
             await session.commit()
+            # sessions on other devices have to login with the new password
+            await revocation_list.revoke_user_tokens(str(user.uid))
             return {"message": "Password updated successfully"}
-        except (InvalidToken, InvalidCredentials):
+        except (InvalidToken, InvalidCredentials, ServerBusy):
             raise
         except Exception as e:
             print(e)
             raise InterServerException()
 
-    async def search_users(self, search_key: str, session: AsyncSession) -> list[User]:
+    async def search_users(
+        self,
+        search_key: str,
+        session: AsyncSession,
+        cursor: str | None = None,
+        limit: int = 20,
+    ) -> dict:
+        """prefix and trigram search over username and full name.
+
+        Prefix matches rank above fuzzy ones, inside each group users are
+        ordered by trigram similarity. Both filters are served by the
+        gin_trgm_ops indexes on lower(username) and lower(full_name).
+        """
         try:
+            search_key = search_key.strip().lower()
+            if not search_key:
+                return {"items": [], "next_cursor": None}
+            username = func.lower(User.username)
+            full_name = func.lower(User.full_name)
+            prefix = f"{escape_like(search_key)}%"
+            is_prefix_match = or_(username.like(prefix), full_name.like(prefix))
+            rank = cast(
+                func.greatest(
+                    func.similarity(username, search_key),
+                    func.similarity(full_name, search_key),
+                )
+                + case((is_prefix_match, 1), else_=0),
+                Numeric(10, 6),
+            )
             statement = (
-                select(User)
-                .options(selectinload(User.following))
-                .options(selectinload(User.followers))
-                .options(selectinload(User.posts))
-                .where(User.full_name.ilike(f"{search_key}%"))
+                select(
+                    User.uid,
+                    User.username,
+                    User.full_name,
+                    User.profile_url,
+                    rank.label("rank"),
+                )
+                .where(
+                    or_(
+                        is_prefix_match,
+                        username.bool_op("%")(search_key),
+                        full_name.bool_op("%")(search_key),
+                    )
+                )
+                .order_by(rank.desc(), User.uid.desc())
+                .limit(limit + 1)
             )
-            users = await session.exec(statement)
-            return users.all()
+            if cursor is not None:
+                last_rank, last_uid = decode_cursor(cursor, Decimal, UUID)
+                statement = statement.where(
+                    tuple_(rank, User.uid) < tuple_(last_rank, last_uid)
+                )
+            result = await session.exec(statement)
+            rows = result.all()
+
+            next_cursor = None
+            if len(rows) > limit:
+                rows = rows[:limit]
+                next_cursor = encode_cursor([rows[-1].rank, rows[-1].uid])
+            return {"items": rows, "next_cursor": next_cursor}
+        except InvalidCursor:
+            raise
         except Exception as e:
             print(e)
             raise InterServerException()
 
-    async def get_current_user(self, user_data: dict, session: AsyncSession) -> User:
+    async def get_current_user(
+        self, principal: PrincipalModel, session: AsyncSession
+    ) -> User:
         try:
-            username = user_data["user_data"]["username"]
-            user = await self.get_user_by_username(username, session)
+            user = await self.get_user_by_uid(
+                principal.uid, session, UserLoadProfile.card
+            )
             if not user:
                 raise InvalidToken()
             return user
@@ -386,26 +557,90 @@ class AuthService:
             print(e)
             raise InterServerException()
 
+    async def get_follow_list(
+        self,
+        username: str,
+        session: AsyncSession,
+        followers: bool = True,
+        cursor: str | None = None,
+        limit: int = 20,
+    ) -> dict:
+        """newest first page of the followers (or following) of a user"""
+        try:
+            user = await self.get_user_by_username(
+                username, session, UserLoadProfile.identity
+            )
+            if user is None:
+                raise UserNotFound()
+            if followers:
+                owner_column = UserLinkModel.user_uid
+                other_column = UserLinkModel.follower_uid
+            else:
+                owner_column = UserLinkModel.follower_uid
+                other_column = UserLinkModel.user_uid
+            statement = (
+                select(
+                    User.uid,
+                    User.username,
+                    User.full_name,
+                    User.profile_url,
+                    UserLinkModel.followed_at,
+                )
+                .join(UserLinkModel, other_column == User.uid)
+                .where(owner_column == user.uid)
+                .order_by(UserLinkModel.followed_at.desc(), other_column.desc())
+                .limit(limit + 1)
+            )
+            if cursor is not None:
+                last_followed_at, last_uid = decode_cursor(
+                    cursor, datetime.fromisoformat, UUID
+                )
+                statement = statement.where(
+                    tuple_(UserLinkModel.followed_at, other_column)
+                    < tuple_(last_followed_at, last_uid)
+                )
+            result = await session.exec(statement)
+            rows = result.all()
+
+            next_cursor = None
+            if len(rows) > limit:
+                rows = rows[:limit]
+                next_cursor = encode_cursor([rows[-1].followed_at, rows[-1].uid])
+            return {"items": rows, "next_cursor": next_cursor}
+        except (UserNotFound, InvalidCursor):
+            raise
+        except Exception as e:
+            print(e)
+            raise InterServerException()
+
     async def follow_user(
         self,
-        user_data: dict,
+        principal: PrincipalModel,
         following_to_username: str,
         session: AsyncSession,
     ) -> dict:
         try:
             following_to_user = await self.get_user_by_username(
-                following_to_username, session
+                following_to_username, session, UserLoadProfile.identity
             )
             if not following_to_user:
                 raise UserNotFound()
-            current_user_uid = UUID(user_data["user_data"]["uid"])
+            current_user_uid = principal.uid
             if following_to_user.uid == current_user_uid:
                 raise InvalidOperation()
             new_link = UserLinkModel(
                 follower_uid=current_user_uid, user_uid=following_to_user.uid
             )
             session.add(new_link)
+            # a duplicate follow fails here before any counter is touched
+            await session.flush()
+            await self._change_follow_counters(
+                current_user_uid, following_to_user.uid, 1, session
+            )
             await session.commit()
+            await feed_service.add_author(
+                current_user_uid, following_to_user.uid, session
+            )
             return {"message": f"You are following to {following_to_user.full_name} "}
         except IntegrityError:
             raise AlreadyFollowed()
@@ -418,43 +653,106 @@ class AuthService:
 
     async def unfollow_user(
         self,
-        user_data: dict,
+        principal: PrincipalModel,
         following_to_username: str,
         session: AsyncSession,
     ) -> dict:
         try:
             un_following_user = await self.get_user_by_username(
-                following_to_username, session
+                following_to_username, session, UserLoadProfile.identity
             )
             if un_following_user is None:
                 raise UserNotFound()
-            current_user_uid = UUID(user_data["user_data"]["uid"])
-            get_link_statement = select(UserLinkModel).where(
-                UserLinkModel.follower_uid == current_user_uid
-                and UserLinkModel.user_uid == un_following_user.uid
+            current_user_uid = principal.uid
+            delete_link_statement = delete(UserLinkModel).where(
+                UserLinkModel.follower_uid == current_user_uid,
+                UserLinkModel.user_uid == un_following_user.uid,
+            )
+            result = await session.exec(delete_link_statement)
+            if result.rowcount == 0:
+                raise InvalidOperation()
+            await self._change_follow_counters(
+                current_user_uid, un_following_user.uid, -1, session
             )
-            result = await session.exec(get_link_statement)
-            await session.delete(result.first())
             await session.commit()
+            await feed_service.remove_author(
+                current_user_uid, un_following_user.uid, session
+            )
             return {
                 "message": f"successfully unfollowed to {un_following_user.full_name} "
             }
 
-        except UserNotFound:
+        except (UserNotFound, InvalidOperation):
             raise
 
         except Exception as e:
             print(e)
             raise InterServerException()
 
-    async def delete_user(self, user_data: dict, session: AsyncSession) -> None:
+    async def _change_follow_counters(
+        self,
+        follower_uid: UUID,
+        followed_uid: UUID,
+        change: int,
+        session: AsyncSession,
+    ) -> None:
+        await session.exec(
+            update(User)
+            .where(User.uid == followed_uid)
+            .values(followers_count=User.followers_count + change)
+        )
+        await session.exec(
+            update(User)
+            .where(User.uid == follower_uid)
+            .values(following_count=User.following_count + change)
+        )
+
+    async def delete_user(
+        self, principal: PrincipalModel, session: AsyncSession
+    ) -> None:
         try:
-            username = user_data["user_data"]["username"]
-            user = await self.get_user_by_username(username, session)
-            if not User:
+            uid = principal.uid
+            # the other side of every follow link loses a follower or following
+            await session.exec(
+                update(User)
+                .where(
+                    User.uid.in_(
+                        select(UserLinkModel.user_uid).where(
+                            UserLinkModel.follower_uid == uid
+                        )
+                    )
+                )
+                .values(followers_count=User.followers_count - 1)
+            )
+            await session.exec(
+                update(User)
+                .where(
+                    User.uid.in_(
+                        select(UserLinkModel.follower_uid).where(
+                            UserLinkModel.user_uid == uid
+                        )
+                    )
+                )
+                .values(following_count=User.following_count - 1)
+            )
+            await session.exec(
+                delete(UserLinkModel).where(
+                    or_(
+                        UserLinkModel.follower_uid == uid, UserLinkModel.user_uid == uid
+                    )
+                )
+            )
+            # posts of the user together with everything attached to them
+            post_uids = select(Post.uid).where(Post.user_uid == uid)
+            for model in (TagAndPostLinkModel, Like, Comment, Share):
+                await session.exec(delete(model).where(model.post_uid.in_(post_uids)))
+            await session.exec(delete(Post).where(Post.user_uid == uid))
+            result = await session.exec(delete(User).where(User.uid == uid))
+            if result.rowcount == 0:
                 raise InvalidToken()
-            await session.delete(user)
             await session.commit()
+            await delete_data_from_redis(get_principal_cache_key(principal.uid))
+            await revocation_list.revoke_user_tokens(str(principal.uid))
         except InvalidToken:
             raise
         except Exception as e:
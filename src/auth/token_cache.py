@@ -0,0 +1,61 @@
+from collections import OrderedDict
+
+import hashlib
+import time
+
+
+class VerifiedTokenCache:
+    """LRU cache of decoded jwt payloads whose signature was already verified.
+
+    Entries are keyed by a digest of the token, so raw tokens are never kept in
+    memory, and they expire at the token's own `exp` claim.
+    """
+
+    def __init__(self, max_size: int = 10_000):
+        self.max_size = max_size
+        self._entries: OrderedDict[bytes, tuple[dict, float]] = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @staticmethod
+    def _get_key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> dict | None:
+        key = self._get_key(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            self._misses += 1
+            return None
+        payload, expires_at = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            self._misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self._hits += 1
+        return payload
+
+    def put(self, token: str, payload: dict) -> None:
+        expires_at = payload.get("exp")
+        if expires_at is None:
+            # tokens without expiry are never cached
+            return
+        key = self._get_key(token)
+        self._entries[key] = (payload, float(expires_at))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def metrics(self) -> dict:
+        lookups = self._hits + self._misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self._hits,
+            "misses": self._misses,
+            "evictions": self._evictions,
+            "hit_ratio": self._hits / lookups if lookups else 0.0,
+        }
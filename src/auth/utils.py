@@ -3,14 +3,21 @@ import jwt
 from jwt.exceptions import PyJWTError, ExpiredSignatureError
 
 import random
+import uuid
 from datetime import datetime, timedelta, timezone
 
 from core.exceptions.exceptions import InterServerException, InvalidToken, ExpiredToken
+from core.utils.metrics import register_metrics
 from src.config import Config
+from .token_cache import VerifiedTokenCache
 
 
 argon = PasswordHasher()
 
+# clients send the same access token in bursts, so verify each token once
+token_cache = VerifiedTokenCache(max_size=Config.TOKEN_CACHE_SIZE)
+register_metrics("token_cache", token_cache.metrics)
+
 
 def generate_otp() -> str:
     """generate the otp of length of 6"""
@@ -20,6 +27,10 @@ def generate_otp() -> str:
     return otp
 
 
+def get_principal_cache_key(uid: uuid.UUID | str) -> str:
+    return f"principal:{uid}"
+
+
 def hash_password(password: str) -> str:
     try:
         return argon.hash(password=password)
@@ -41,9 +52,13 @@ def create_jwt_token(
     refresh: bool = False,
 ) -> str:
     try:
+        issued_at = datetime.now(timezone.utc)
         payload = {
             "user_data": data,
-            "exp": datetime.now(timezone.utc) + exp_time,
+            "jti": uuid.uuid4().hex,
+            # float so a token issued right after a revocation isn't revoked
+            "iat": issued_at.timestamp(),
+            "exp": issued_at + exp_time,
             "refresh": refresh,
         }
         token = jwt.encode(
@@ -58,6 +73,9 @@ def create_jwt_token(
 
 
 def decode_jwt_token(token: str) -> dict:
+    cached_data = token_cache.get(token)
+    if cached_data is not None:
+        return cached_data
     try:
         data: dict = jwt.decode(
             token,
@@ -65,6 +83,7 @@ def decode_jwt_token(token: str) -> dict:
             key=Config.JWT_SECRETE,
             options={"verify_exp": True},
         )
+        token_cache.put(token, data)
         return data
     except ExpiredSignatureError:
         raise ExpiredToken()
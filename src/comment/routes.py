@@ -2,12 +2,18 @@ from fastapi import APIRouter, Depends, Body, Path, Query
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from typing import Annotated
+from uuid import UUID
 
 from core.database.main import get_session
-from core.schemas import GeneralResponseModel
-from src.auth.dependencies import access_token_bearer
+from core.schemas import GeneralResponseModel, PageModel
+from src.auth.dependencies import (
+    access_token_bearer,
+    get_current_principal,
+    get_user_session,
+)
+from src.auth.schemas import PrincipalModel
 from .service import comment_service
-from .schema import UpdatePostComment
+from .schema import UpdatePostComment, ThreadCommentModel
 
 comment_router = APIRouter()
 
@@ -18,17 +24,31 @@ comment_router = APIRouter()
     response_model=GeneralResponseModel,
 )
 async def add_comment(
-    user_data: Annotated[dict, Depends(access_token_bearer)],
+    principal: Annotated[PrincipalModel, Depends(get_current_principal)],
     comment_data: Annotated[UpdatePostComment, Body()],
     session: Annotated[AsyncSession, Depends(get_session)],
 ):
     return await comment_service.add_comment_to_post(
-        user_data,
+        principal,
         comment_data,
         session,
     )
 
 
+@comment_router.get(
+    "/by-post/{post_uid}",
+    response_model=PageModel[ThreadCommentModel],
+)
+async def get_comments_by_post(
+    post_uid: Annotated[UUID, Path()],
+    _: Annotated[dict, Depends(access_token_bearer)],
+    session: Annotated[AsyncSession, Depends(get_session)],
+    cursor: Annotated[str | None, Query()] = None,
+    limit: Annotated[int, Query(ge=1, le=50)] = 20,
+):
+    return await comment_service.get_comments_by_post(post_uid, session, cursor, limit)
+
+
 @comment_router.patch(
     "/update-comment/{comment_uid}",
     response_model=GeneralResponseModel,
@@ -37,7 +57,7 @@ async def update_comment(
     _: Annotated[dict, Depends(access_token_bearer)],
     comment_uid: Annotated[str, Path()],
     new_comment: Annotated[str, Query()],
-    session: Annotated[AsyncSession, Depends(get_session)],
+    session: Annotated[AsyncSession, Depends(get_user_session)],
 ):
     return await comment_service.update_comment(new_comment, comment_uid, session)
 
@@ -46,6 +66,6 @@ async def update_comment(
 async def update_comment(
     _: Annotated[dict, Depends(access_token_bearer)],
     comment_uid: Annotated[str, Path()],
-    session: Annotated[AsyncSession, Depends(get_session)],
+    session: Annotated[AsyncSession, Depends(get_user_session)],
 ):
     await comment_service.delete_comment(comment_uid, session)
@@ -1,8 +1,20 @@
 from pydantic import BaseModel
 
 from uuid import UUID
+from datetime import datetime
+
+from core.schemas import UserCardModel
 
 
 class UpdatePostComment(BaseModel):
     post_uid: UUID
     comment: str
+
+
+class ThreadCommentModel(BaseModel):
+    comment_uid: UUID
+    comment: str
+    commented_at: datetime
+    updated_at: datetime | None = None
+    # None when the commenter's account is gone
+    commenter: UserCardModel | None = None
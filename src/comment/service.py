@@ -1,5 +1,6 @@
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import tuple_
 
 from uuid import UUID
 from datetime import datetime
@@ -8,9 +9,12 @@ from core.exceptions.exceptions import (
     InterServerException,
     PostNotFound,
     InvalidOperation,
+    InvalidCursor,
 )
-from core.database.models import Comment
+from core.database.models import Comment, User
+from core.utils.pagination import encode_cursor, decode_cursor
 from src.post.service import post_service
+from src.auth.schemas import PrincipalModel
 from .schema import UpdatePostComment
 
 
@@ -25,9 +29,77 @@ class CommentService:
             print(e)
             raise InterServerException()
 
+    async def get_comments_by_post(
+        self,
+        post_uid: UUID,
+        session: AsyncSession,
+        cursor: str | None = None,
+        limit: int = 20,
+    ) -> dict:
+        """newest first page of the comments of a post, the commenter cards of
+        the page are loaded in one more query"""
+        try:
+            statement = (
+                select(
+                    Comment.comment_uid,
+                    Comment.comment,
+                    Comment.commented_at,
+                    Comment.updated_at,
+                    Comment.commenter_uid,
+                )
+                .where(Comment.post_uid == post_uid)
+                .order_by(Comment.commented_at.desc(), Comment.comment_uid.desc())
+                .limit(limit + 1)
+            )
+            if cursor is not None:
+                last_commented_at, last_uid = decode_cursor(
+                    cursor, datetime.fromisoformat, UUID
+                )
+                statement = statement.where(
+                    tuple_(Comment.commented_at, Comment.comment_uid)
+                    < tuple_(last_commented_at, last_uid)
+                )
+            result = await session.exec(statement)
+            rows = result.all()
+
+            next_cursor = None
+            if len(rows) > limit:
+                rows = rows[:limit]
+                next_cursor = encode_cursor(
+                    [rows[-1].commented_at, rows[-1].comment_uid]
+                )
+
+            commenters = {}
+            commenter_uids = {row.commenter_uid for row in rows}
+            if commenter_uids:
+                result = await session.exec(
+                    select(
+                        User.uid, User.username, User.full_name, User.profile_url
+                    ).where(User.uid.in_(commenter_uids))
+                )
+                commenters = {user.uid: dict(user._mapping) for user in result.all()}
+            return {
+                "items": [
+                    {
+                        "comment_uid": row.comment_uid,
+                        "comment": row.comment,
+                        "commented_at": row.commented_at,
+                        "updated_at": row.updated_at,
+                        "commenter": commenters.get(row.commenter_uid),
+                    }
+                    for row in rows
+                ],
+                "next_cursor": next_cursor,
+            }
+        except InvalidCursor:
+            raise
+        except Exception as e:
+            print(e)
+            raise InterServerException()
+
     async def add_comment_to_post(
         self,
-        user_data: dict,
+        principal: PrincipalModel,
         comment_data: UpdatePostComment,
         session: AsyncSession,
     ):
@@ -35,12 +107,11 @@ class CommentService:
             post = await post_service.get_post_by_uid(
                 comment_data.post_uid, session=session
             )
-            commenter_uid = user_data["user_data"]["uid"]
             if post is None:
                 raise PostNotFound()
             comment = Comment(
                 post_uid=comment_data.post_uid,
-                commenter_uid=UUID(commenter_uid),
+                commenter_uid=principal.uid,
                 comment=comment_data.comment,
             )
             session.add(comment)
@@ -1,9 +1,33 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+from typing import Literal
+
 
 class Settings(BaseSettings):
     # database
     DATABASE_URL: str
+    # connection pool of each worker process. With DB_MAX_CONNECTIONS set the
+    # pool is cut down so WEB_WORKERS pools together stay under it
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 5.0
+    DB_POOL_RECYCLE: int = 30 * 60
+    DB_POOL_PRE_PING: bool = True
+    DB_MAX_CONNECTIONS: int | None = None
+    WEB_WORKERS: int = 1
+    # asyncpg prepared statements, 0 when running behind pgbouncer in
+    # transaction mode
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    DB_COMMAND_TIMEOUT: float = 30.0
+    DB_STATEMENT_TIMEOUT_MS: int = 30_000
+    DB_IDLE_IN_TRANSACTION_TIMEOUT_MS: int = 60_000
+    # read replicas serve the read only endpoints, a user that wrote reads
+    # from the primary for DB_REPLICA_STICKY_SECONDS to see their own writes
+    DATABASE_REPLICA_URLS: list[str] = []
+    DB_REPLICA_STICKY_SECONDS: float = 5.0
+    # fail on every implicit relationship load, for tests and development
+    STRICT_LOADING: bool = False
+    # use fakeredis:// to run against an in memory redis stand-in
     REDIS_URL: str
 
     # mailing
@@ -14,9 +38,58 @@ class Settings(BaseSettings):
     CLOUDINARY_API_KEY: str
     CLOUDINARY_API_SECRET: str
 
+    # media storage, local keeps files on disk as a stand-in for cloudinary
+    STORAGE_BACKEND: Literal["cloudinary", "local"] = "cloudinary"
+    LOCAL_STORAGE_DIR: str = "media/storage"
+    LOCAL_STORAGE_BASE_URL: str = "/media"
+    MEDIA_SPOOL_DIR: str = "media/spool"
+    MEDIA_WORKERS: int = 2
+    MEDIA_QUEUE_SIZE: int = 100
+    UPLOAD_SPOOL_DIR: str = "media/uploads"
+    MAX_UPLOAD_SIZE: int = 20 * 1024 * 1024
+    MAX_UPLOAD_CHUNK_SIZE: int = 4 * 1024 * 1024
+    UPLOAD_SESSION_SECONDS: int = 24 * 60 * 60
+    UPLOAD_SWEEP_INTERVAL_SECONDS: int = 10 * 60
+    IMAGE_WORKERS: int = 2
+    IMAGE_MAX_PENDING: int = 8
+    # media workers wait in the queue, they are not user facing requests
+    IMAGE_QUEUE_TIMEOUT: float = 60.0
+
+    # home timelines, authors above the threshold are merged in on read
+    FEED_MAX_LENGTH: int = 800
+    FEED_FANOUT_THRESHOLD: int = 10_000
+    FEED_FANOUT_BATCH_SIZE: int = 1000
+    FEED_TIMELINE_BUILT_SECONDS: int = 24 * 60 * 60
+    # ranked feed, the newest candidates are scored then ordered by score
+    FEED_RANKING_CANDIDATES: int = 500
+    FEED_RANKING_HALF_LIFE_HOURS: float = 24.0
+    FEED_WEIGHT_RECENCY: float = 1.0
+    FEED_WEIGHT_ENGAGEMENT: float = 0.6
+    FEED_WEIGHT_AUTHOR_AFFINITY: float = 0.8
+    FEED_WEIGHT_TAG_AFFINITY: float = 0.4
+
+    # likes, write behind keeps them in redis and flushes them in batches
+    LIKES_WRITE_BEHIND: bool = False
+    LIKES_FLUSH_BATCH_SIZE: int = 500
+    LIKES_FLUSH_INTERVAL_MS: int = 1000
+    LIKES_CACHE_SECONDS: int = 7 * 24 * 60 * 60
+
     # JWT
     JWT_SECRETE: str
     JWT_ALGO: str
+    TOKEN_CACHE_SIZE: int = 10_000
+    TOKEN_REVOCATION_CAPACITY: int = 100_000
+    TOKEN_REVOCATION_ERROR_RATE: float = 0.001
+    TOKEN_REVOCATION_REBUILD_SECONDS: int = 60 * 60
+
+    # password hashing
+    HASHING_EXECUTOR: Literal["process", "thread"] = "process"
+    HASHING_WORKERS: int = 2
+    HASHING_MAX_PENDING: int = 32
+    HASHING_QUEUE_TIMEOUT: float = 2.0
+
+    # scrapers send it as a bearer token, /metrics is not served without it
+    METRICS_TOKEN: str | None = None
 
     # Configurations
     model_config = SettingsConfigDict(
@@ -0,0 +1,44 @@
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+import asyncio
+
+from core.database.main import Session
+from core.database.models import User
+from .service import feed_service
+
+BATCH_SIZE = 1000
+
+
+async def backfill_timelines(
+    session: AsyncSession, batch_size: int = BATCH_SIZE
+) -> int:
+    """rebuilds the redis timeline of every user from the follow graph, for
+    existing graphs and after redis lost its data. Returns how many users
+    were rebuilt."""
+    rebuilt = 0
+    last_uid = None
+    while True:
+        statement = select(User.uid).order_by(User.uid).limit(batch_size)
+        if last_uid is not None:
+            statement = statement.where(User.uid > last_uid)
+        result = await session.exec(statement)
+        uids = result.all()
+        if not uids:
+            break
+        last_uid = uids[-1]
+        for uid in uids:
+            await feed_service.backfill_timeline(uid, session)
+        rebuilt += len(uids)
+    return rebuilt
+
+
+async def main() -> None:
+    async with Session() as session:
+        rebuilt = await backfill_timelines(session)
+    print(f"backfilled timelines of {rebuilt} users")
+
+
+if __name__ == "__main__":
+    # python -m src.feed.commands
+    asyncio.run(main())
@@ -0,0 +1,32 @@
+from fastapi import APIRouter, Depends, Query
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from typing import Annotated
+
+from core.database.main import get_session
+from core.schemas import PageModel, PostSummaryModel
+from src.auth.dependencies import get_current_principal
+from src.auth.schemas import PrincipalModel
+from .service import feed_service
+
+feed_router = APIRouter()
+
+
+@feed_router.get("/", response_model=PageModel[PostSummaryModel])
+async def get_feed(
+    principal: Annotated[PrincipalModel, Depends(get_current_principal)],
+    session: Annotated[AsyncSession, Depends(get_session)],
+    cursor: Annotated[str | None, Query()] = None,
+    limit: Annotated[int, Query(ge=1, le=50)] = 20,
+):
+    return await feed_service.get_feed(principal, session, cursor, limit)
+
+
+@feed_router.get("/ranked", response_model=PageModel[PostSummaryModel])
+async def get_ranked_feed(
+    principal: Annotated[PrincipalModel, Depends(get_current_principal)],
+    session: Annotated[AsyncSession, Depends(get_session)],
+    cursor: Annotated[str | None, Query()] = None,
+    limit: Annotated[int, Query(ge=1, le=50)] = 20,
+):
+    return await feed_service.get_ranked_feed(principal, session, cursor, limit)
@@ -0,0 +1,461 @@
+from sqlmodel import select
+from sqlalchemy import func, or_, tuple_, union_all
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+import numpy as np
+
+from uuid import UUID
+from datetime import datetime
+
+from core.database.main import Session
+from core.database.models import (
+    Post,
+    User,
+    UserLinkModel,
+    Like,
+    Comment,
+    Share,
+    TagAndPostLinkModel,
+)
+from core.database.redis import redis
+from core.utils.enums import PostStatusEnum
+from core.utils.metrics import register_metrics
+from core.utils.pagination import encode_cursor, decode_cursor
+from core.exceptions.exceptions import InterServerException, InvalidCursor
+from src.auth.schemas import PrincipalModel
+from src.post.summary import get_post_summary_columns
+from src.like.service import like_service
+from src.config import Config
+from .ranking import RankingWeights, score_candidates, sum_tag_affinity, rank_candidates
+
+# extra timeline entries read per page, they cover posts sharing the score of
+# the cursor which are skipped
+TIE_SLACK = 10
+
+
+def get_timeline_key(user_uid: UUID) -> str:
+    return f"timeline:{user_uid}"
+
+
+def get_timeline_built_key(user_uid: UUID) -> str:
+    return f"timeline-built:{user_uid}"
+
+
+def get_post_score(created_at: datetime | None) -> float:
+    return (created_at or datetime.now()).timestamp()
+
+
+class FeedService:
+    """Home timelines kept in redis sorted sets.
+
+    When a post becomes ready its uid is pushed into the timeline of its author
+    and of every follower (fan-out on write), scored by creation time and
+    capped at max_length entries. Authors with more followers than
+    fanout_threshold are not fanned out, their followers read their posts
+    from the database while paging and merge them in (fan-out on read).
+    A page is hydrated into post summaries with one query. A timeline is
+    backfilled from the database when its built marker is missing, so an
+    empty timeline isn't rebuilt on every read.
+    """
+
+    def __init__(self, max_length: int, fanout_threshold: int, batch_size: int):
+        self.max_length = max_length
+        self.fanout_threshold = fanout_threshold
+        self.batch_size = batch_size
+        self._fanned_out_posts = 0
+        self._skipped_posts = 0
+        self._timeline_writes = 0
+        self._backfills = 0
+        self.weights = RankingWeights.from_config()
+
+    async def _push(
+        self, entries: dict[str, float], user_uids: list[UUID]
+    ) -> None:
+        pipeline = redis.pipeline(transaction=False)
+        for user_uid in user_uids:
+            key = get_timeline_key(user_uid)
+            pipeline.zadd(key, entries)
+            pipeline.zremrangebyrank(key, 0, -(self.max_length + 1))
+        await pipeline.execute()
+        self._timeline_writes += len(user_uids)
+
+    async def fan_out(self, post_uid: UUID) -> None:
+        """pushes a ready post into the timelines of its author's followers"""
+        try:
+            async with Session() as session:
+                result = await session.exec(
+                    select(Post.user_uid, Post.created_at, User.followers_count)
+                    .join(User, User.uid == Post.user_uid)
+                    .where(Post.uid == post_uid, Post.status == PostStatusEnum.ready)
+                )
+                post = result.first()
+                if post is None:
+                    return
+                entries = {str(post_uid): get_post_score(post.created_at)}
+                await self._push(entries, [post.user_uid])
+                if post.followers_count > self.fanout_threshold:
+                    # followers read it from the database
+                    self._skipped_posts += 1
+                    return
+                last_link = None
+                while True:
+                    statement = (
+                        select(UserLinkModel.followed_at, UserLinkModel.follower_uid)
+                        .where(UserLinkModel.user_uid == post.user_uid)
+                        .order_by(
+                            UserLinkModel.followed_at, UserLinkModel.follower_uid
+                        )
+                        .limit(self.batch_size)
+                    )
+                    if last_link is not None:
+                        statement = statement.where(
+                            tuple_(
+                                UserLinkModel.followed_at, UserLinkModel.follower_uid
+                            )
+                            > last_link
+                        )
+                    result = await session.exec(statement)
+                    links = result.all()
+                    if not links:
+                        break
+                    await self._push(entries, [link.follower_uid for link in links])
+                    last_link = tuple_(*links[-1])
+            self._fanned_out_posts += 1
+        except Exception as e:
+            # the post stays reachable through a backfill
+            print(f"Error while fanning out post {post_uid}: {e}")
+
+    async def _get_author_entries(
+        self, author_uid: UUID, session: AsyncSession
+    ) -> dict[str, float]:
+        result = await session.exec(
+            select(Post.uid, Post.created_at)
+            .where(Post.user_uid == author_uid, Post.status == PostStatusEnum.ready)
+            .order_by(Post.created_at.desc())
+            .limit(self.max_length)
+        )
+        return {
+            str(post_uid): get_post_score(created_at)
+            for post_uid, created_at in result.all()
+        }
+
+    async def add_author(
+        self, follower_uid: UUID, author_uid: UUID, session: AsyncSession
+    ) -> None:
+        """merges the recent posts of a newly followed author"""
+        try:
+            result = await session.exec(
+                select(User.followers_count).where(User.uid == author_uid)
+            )
+            if result.one() > self.fanout_threshold:
+                return
+            entries = await self._get_author_entries(author_uid, session)
+            if entries:
+                await self._push(entries, [follower_uid])
+        except Exception as e:
+            print(f"Error while adding {author_uid} to timeline: {e}")
+
+    async def remove_author(
+        self, follower_uid: UUID, author_uid: UUID, session: AsyncSession
+    ) -> None:
+        try:
+            entries = await self._get_author_entries(author_uid, session)
+            if entries:
+                await redis.zrem(get_timeline_key(follower_uid), *entries)
+        except Exception as e:
+            print(f"Error while removing {author_uid} from timeline: {e}")
+
+    async def backfill_timeline(self, user_uid: UUID, session: AsyncSession) -> int:
+        """rebuilds a timeline from the follow graph, returns its length"""
+        followed = select(UserLinkModel.user_uid).where(
+            UserLinkModel.follower_uid == user_uid,
+            UserLinkModel.user_uid.in_(
+                select(User.uid).where(User.followers_count <= self.fanout_threshold)
+            ),
+        )
+        result = await session.exec(
+            select(Post.uid, Post.created_at)
+            .where(
+                or_(Post.user_uid == user_uid, Post.user_uid.in_(followed)),
+                Post.status == PostStatusEnum.ready,
+            )
+            .order_by(Post.created_at.desc())
+            .limit(self.max_length)
+        )
+        entries = {
+            str(post_uid): get_post_score(created_at)
+            for post_uid, created_at in result.all()
+        }
+        key = get_timeline_key(user_uid)
+        pipeline = redis.pipeline(transaction=True)
+        pipeline.delete(key)
+        if entries:
+            pipeline.zadd(key, entries)
+        pipeline.set(
+            get_timeline_built_key(user_uid), 1, ex=Config.FEED_TIMELINE_BUILT_SECONDS
+        )
+        await pipeline.execute()
+        self._backfills += 1
+        return len(entries)
+
+    async def _ensure_timeline(self, user_uid: UUID, session: AsyncSession) -> None:
+        # first read, or redis lost the timeline
+        if not await redis.exists(get_timeline_built_key(user_uid)):
+            await self.backfill_timeline(user_uid, session)
+
+    async def _get_pulled_entries(
+        self,
+        user_uid: UUID,
+        last: tuple[float, str] | None,
+        count: int,
+        session: AsyncSession,
+    ) -> list[tuple[float, str]]:
+        """newest posts of the followed authors that are not fanned out"""
+        celebrities = (
+            select(UserLinkModel.user_uid)
+            .join(User, User.uid == UserLinkModel.user_uid)
+            .where(
+                UserLinkModel.follower_uid == user_uid,
+                User.followers_count > self.fanout_threshold,
+            )
+        )
+        statement = (
+            select(Post.uid, Post.created_at)
+            .where(
+                Post.user_uid.in_(celebrities),
+                Post.status == PostStatusEnum.ready,
+            )
+            .order_by(Post.created_at.desc(), Post.uid.desc())
+            .limit(count)
+        )
+        if last is not None:
+            statement = statement.where(
+                tuple_(Post.created_at, Post.uid)
+                < tuple_(datetime.fromtimestamp(last[0]), UUID(last[1]))
+            )
+        result = await session.exec(statement)
+        return [
+            (get_post_score(created_at), str(post_uid))
+            for post_uid, created_at in result.all()
+        ]
+
+    async def get_feed(
+        self,
+        principal: PrincipalModel,
+        session: AsyncSession,
+        cursor: str | None = None,
+        limit: int = 20,
+    ) -> dict:
+        """newest first page of the home timeline"""
+        try:
+            last = None
+            if cursor is not None:
+                last_score, last_uid = decode_cursor(cursor, float, UUID)
+                last = (last_score, str(last_uid))
+            key = get_timeline_key(principal.uid)
+            if last is None:
+                await self._ensure_timeline(principal.uid, session)
+
+            timeline = await redis.zrevrangebyscore(
+                key,
+                max=last[0] if last is not None else "+inf",
+                min="-inf",
+                start=0,
+                num=limit + 1 + TIE_SLACK,
+                withscores=True,
+            )
+            entries = {
+                member.decode(): score
+                for member, score in timeline
+                if last is None or (score, member.decode()) < last
+            }
+            for score, post_uid in await self._get_pulled_entries(
+                principal.uid, last, limit + 1, session
+            ):
+                entries[post_uid] = score
+            candidates = sorted(
+                ((score, post_uid) for post_uid, score in entries.items()),
+                reverse=True,
+            )[: limit + 1]
+
+            result = await session.exec(
+                select(*get_post_summary_columns()).where(
+                    Post.uid.in_([UUID(post_uid) for _, post_uid in candidates]),
+                    Post.status == PostStatusEnum.ready,
+                )
+            )
+            posts = {str(post.uid): post for post in result.all()}
+            stale = [post_uid for _, post_uid in candidates if post_uid not in posts]
+            if stale:
+                # deleted posts leave the timeline lazily
+                await redis.zrem(key, *stale)
+
+            next_cursor = None
+            if len(candidates) > limit:
+                candidates = candidates[:limit]
+                next_cursor = encode_cursor(list(candidates[-1]))
+            items = [posts[post_uid] for _, post_uid in candidates if post_uid in posts]
+            return {
+                "items": await like_service.apply_cached_likes(items),
+                "next_cursor": next_cursor,
+            }
+        except InvalidCursor:
+            raise
+        except Exception as e:
+            print(e)
+            raise InterServerException()
+
+    async def _get_candidates(self, user_uid: UUID, session: AsyncSession) -> list[str]:
+        """uids of the newest posts of the timeline, pulled posts included"""
+        key = get_timeline_key(user_uid)
+        await self._ensure_timeline(user_uid, session)
+        timeline = await redis.zrevrange(
+            key, 0, Config.FEED_RANKING_CANDIDATES - 1, withscores=True
+        )
+        entries = {member.decode(): score for member, score in timeline}
+        for score, post_uid in await self._get_pulled_entries(
+            user_uid, None, Config.FEED_RANKING_CANDIDATES, session
+        ):
+            entries[post_uid] = score
+        return [
+            post_uid
+            for post_uid, _ in sorted(
+                entries.items(), key=lambda entry: entry[1], reverse=True
+            )[: Config.FEED_RANKING_CANDIDATES]
+        ]
+
+    async def _get_affinities(
+        self,
+        user_uid: UUID,
+        post_uids: list[UUID],
+        author_uids: list[UUID],
+        session: AsyncSession,
+    ) -> tuple[dict, list, dict]:
+        """how often the viewer engaged with each author and tag, and the tags
+        of the candidates"""
+        engaged_posts = union_all(
+            select(Like.post_uid).where(Like.liker_uid == user_uid),
+            select(Comment.post_uid).where(Comment.commenter_uid == user_uid),
+            select(Share.post_uid).where(Share.sharer_uid == user_uid),
+        ).subquery()
+        result = await session.exec(
+            select(Post.user_uid, func.count())
+            .join(engaged_posts, engaged_posts.c.post_uid == Post.uid)
+            .where(Post.user_uid.in_(author_uids))
+            .group_by(Post.user_uid)
+        )
+        author_affinity = dict(result.all())
+
+        result = await session.exec(
+            select(TagAndPostLinkModel.post_uid, TagAndPostLinkModel.tag_uid).where(
+                TagAndPostLinkModel.post_uid.in_(post_uids)
+            )
+        )
+        post_tags = result.all()
+        result = await session.exec(
+            select(TagAndPostLinkModel.tag_uid, func.count())
+            .join(
+                engaged_posts,
+                engaged_posts.c.post_uid == TagAndPostLinkModel.post_uid,
+            )
+            .where(
+                TagAndPostLinkModel.tag_uid.in_({tag_uid for _, tag_uid in post_tags})
+            )
+            .group_by(TagAndPostLinkModel.tag_uid)
+        )
+        tag_affinity = dict(result.all())
+        return author_affinity, post_tags, tag_affinity
+
+    async def get_ranked_feed(
+        self,
+        principal: PrincipalModel,
+        session: AsyncSession,
+        cursor: str | None = None,
+        limit: int = 20,
+    ) -> dict:
+        """page of the newest candidates ordered by their ranking score. The
+        cursor is an offset into the ranking, which is computed again for
+        every page"""
+        try:
+            offset = 0
+            if cursor is not None:
+                (offset,) = decode_cursor(cursor, int)
+                if offset < 0:
+                    raise InvalidCursor()
+            candidates = await self._get_candidates(principal.uid, session)
+            if not candidates:
+                return {"items": [], "next_cursor": None}
+            result = await session.exec(
+                select(*get_post_summary_columns()).where(
+                    Post.uid.in_([UUID(post_uid) for post_uid in candidates]),
+                    Post.status == PostStatusEnum.ready,
+                )
+            )
+            posts = result.all()
+            if not posts:
+                return {"items": [], "next_cursor": None}
+            post_uids = [post.uid for post in posts]
+            author_affinity, post_tags, tag_affinity = await self._get_affinities(
+                principal.uid,
+                post_uids,
+                list({post.user_uid for post in posts}),
+                session,
+            )
+
+            now = datetime.now()
+            post_indexes = {post_uid: index for index, post_uid in enumerate(post_uids)}
+            scores = score_candidates(
+                ages_seconds=np.array(
+                    [(now - (post.created_at or now)).total_seconds() for post in posts]
+                ),
+                likes=np.array([post.likes_count for post in posts], dtype=float),
+                comments=np.array([post.comments_count for post in posts], dtype=float),
+                shares=np.array([post.shares_count for post in posts], dtype=float),
+                author_affinity=np.array(
+                    [author_affinity.get(post.user_uid, 0) for post in posts],
+                    dtype=float,
+                ),
+                tag_affinity=sum_tag_affinity(
+                    np.array(
+                        [post_indexes[post_uid] for post_uid, _ in post_tags],
+                        dtype=np.intp,
+                    ),
+                    np.array(
+                        [tag_affinity.get(tag_uid, 0) for _, tag_uid in post_tags],
+                        dtype=float,
+                    ),
+                    len(posts),
+                ),
+                weights=self.weights,
+            )
+            ranking = rank_candidates(scores)[offset : offset + limit]
+            next_cursor = None
+            if offset + limit < len(posts):
+                next_cursor = encode_cursor([offset + limit])
+            return {
+                "items": await like_service.apply_cached_likes(
+                    [posts[index] for index in ranking]
+                ),
+                "next_cursor": next_cursor,
+            }
+        except InvalidCursor:
+            raise
+        except Exception as e:
+            print(e)
+            raise InterServerException()
+
+    def metrics(self) -> dict:
+        return {
+            "fanned_out_posts": self._fanned_out_posts,
+            "skipped_posts": self._skipped_posts,
+            "timeline_writes": self._timeline_writes,
+            "backfills": self._backfills,
+        }
+
+
+feed_service = FeedService(
+    max_length=Config.FEED_MAX_LENGTH,
+    fanout_threshold=Config.FEED_FANOUT_THRESHOLD,
+    batch_size=Config.FEED_FANOUT_BATCH_SIZE,
+)
+register_metrics("feed", feed_service.metrics)
@@ -0,0 +1,89 @@
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+from sqlmodel import func, select
+from sqlalchemy import delete
+
+from core.database.main import Session, async_engine
+from core.database.models import Like
+from .service import like_service
+
+
+async def _client(post_uid: uuid.UUID, liker_uids: list[uuid.UUID], toggles: int):
+    """toggles the likes of a few users on the post as fast as it can, returns
+    the latency of each toggle"""
+    latencies = []
+    async with Session() as session:
+        for index in range(toggles):
+            start = time.perf_counter()
+            await like_service.toggle_like(
+                liker_uids[index % len(liker_uids)], post_uid, session
+            )
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def benchmark(
+    post_uid: uuid.UUID, clients: int, toggles: int, likers_per_client: int
+) -> None:
+    """hammers one post from many concurrent clients. Clients share likers
+    pairwise so concurrent toggles of the same (post, liker) pair contend on
+    the unique index too"""
+    likers = [uuid.uuid4() for _ in range(clients * likers_per_client // 2 or 1)]
+
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(
+            _client(
+                post_uid,
+                [
+                    likers[(client // 2 * likers_per_client + i) % len(likers)]
+                    for i in range(likers_per_client)
+                ],
+                toggles,
+            )
+            for client in range(clients)
+        )
+    )
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for client in results for latency in client)
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(f"{len(latencies)} toggles from {clients} clients in {elapsed:.2f} s")
+    print(f"{len(latencies) / elapsed:.0f} toggles per second")
+    print(
+        f"latency p50 {quantiles[49] * 1000:.2f} ms, "
+        f"p95 {quantiles[94] * 1000:.2f} ms, p99 {quantiles[98] * 1000:.2f} ms"
+    )
+
+    async with Session() as session:
+        run_likes = (Like.post_uid == post_uid, Like.liker_uid.in_(likers))
+        result = await session.exec(
+            select(func.count(), func.count(Like.liker_uid.distinct())).where(
+                *run_likes
+            )
+        )
+        rows, distinct_likers = result.one()
+        # a duplicated (post, liker) pair would show up as more rows than likers
+        print(f"{rows} likes left by {distinct_likers} distinct likers")
+        await session.exec(delete(Like).where(*run_likes))
+        await session.commit()
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    # python -m src.like.benchmark <post uid>
+    parser = argparse.ArgumentParser(
+        description="contention benchmark of the like toggle on one post"
+    )
+    parser.add_argument("post_uid", type=uuid.UUID)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--toggles", type=int, default=200)
+    parser.add_argument("--likers-per-client", type=int, default=4)
+    args = parser.parse_args()
+    asyncio.run(
+        benchmark(args.post_uid, args.clients, args.toggles, args.likers_per_client)
+    )
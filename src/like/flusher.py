@@ -0,0 +1,195 @@
+from sqlmodel import select
+from sqlalchemy import delete, exists, func, tuple_, values, column
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID, insert
+from redis.exceptions import ResponseError
+
+import asyncio
+import os
+import socket
+import uuid
+
+from core.database.main import Session
+from core.database.models import Like, Post, User
+from core.database.redis import redis
+from core.utils.metrics import register_metrics
+from src.config import Config
+from .service import LIKE_EVENTS_STREAM, get_likers_key, get_like_count_key
+
+LIKE_FLUSHERS_GROUP = "like-flushers"
+# serializes the flushers of every worker so two batches of the same post
+# never interleave
+FLUSH_LOCK_ID = 7_310_442
+# entries a dead consumer left unacknowledged are taken over after this
+CLAIM_IDLE_MS = 60_000
+
+# (post_uid, liker_uid)
+LikePair = tuple[uuid.UUID, uuid.UUID]
+
+
+class LikeFlusher:
+    """Writes the likes recorded in redis to the database in batches.
+
+    Toggles append the touched (post, liker) pair to a redis stream. Flushers
+    of every worker read it through one consumer group, look up the current
+    redis state of each pair and make the database match it, then acknowledge
+    the entries. Applying the state rather than the events makes a batch
+    idempotent: a batch applied twice after a crash, or applied after a newer
+    one, still leaves the latest state. When the cached post expired or was
+    evicted before the flush, the action of the pair's last event is applied
+    instead. Entries of a crashed consumer are claimed again once idle.
+    """
+
+    def __init__(self, batch_size: int, interval_ms: int):
+        self.batch_size = batch_size
+        self.interval_ms = interval_ms
+        self.consumer = f"{socket.gethostname()}-{os.getpid()}"
+        self._task: asyncio.Task | None = None
+        self._flushed_batches = 0
+        self._flushed_pairs = 0
+        self._failed_batches = 0
+
+    async def _ensure_group(self) -> None:
+        try:
+            await redis.xgroup_create(
+                LIKE_EVENTS_STREAM, LIKE_FLUSHERS_GROUP, id="0", mkstream=True
+            )
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def _get_states(
+        self, actions: dict[tuple[str, str], bytes | None]
+    ) -> tuple[list[LikePair], list[LikePair]]:
+        """pairs to insert and to delete. Pairs whose post is not cached any
+        more fall back to the action of their last event"""
+        pairs = list(actions)
+        pipeline = redis.pipeline(transaction=False)
+        for post_uid, liker_uid in pairs:
+            pipeline.exists(get_like_count_key(post_uid))
+            pipeline.sismember(get_likers_key(post_uid), liker_uid)
+        replies = await pipeline.execute()
+        liked, unliked = [], []
+        for index, (post_uid, liker_uid) in enumerate(pairs):
+            if replies[index * 2]:
+                is_liked = bool(replies[index * 2 + 1])
+            elif actions[(post_uid, liker_uid)] is not None:
+                is_liked = actions[(post_uid, liker_uid)] == b"like"
+            else:
+                # recorded before events carried their action
+                continue
+            pair = (uuid.UUID(post_uid), uuid.UUID(liker_uid))
+            if is_liked:
+                liked.append(pair)
+            else:
+                unliked.append(pair)
+        return liked, unliked
+
+    async def apply(self, entries: list[tuple[bytes, dict]]) -> int:
+        # entries come oldest first, the last event of a pair wins
+        actions = {}
+        for _, fields in entries:
+            pair = (fields[b"post_uid"].decode(), fields[b"liker_uid"].decode())
+            actions[pair] = fields.get(b"action")
+        async with Session() as session:
+            await session.exec(select(func.pg_advisory_xact_lock(FLUSH_LOCK_ID)))
+            # read under the lock so the last flusher applies the newest state
+            liked, unliked = await self._get_states(actions)
+            if unliked:
+                await session.exec(
+                    delete(Like).where(
+                        tuple_(Like.post_uid, Like.liker_uid).in_(unliked)
+                    )
+                )
+            if liked:
+                rows = values(
+                    column("uid", PG_UUID),
+                    column("post_uid", PG_UUID),
+                    column("liker_uid", PG_UUID),
+                    name="liked",
+                ).data([(uuid.uuid4(), *pair) for pair in liked])
+                await session.exec(
+                    insert(Like)
+                    .from_select(
+                        ["uid", "post_uid", "liker_uid"],
+                        select(rows.c.uid, rows.c.post_uid, rows.c.liker_uid).where(
+                            # posts or users deleted since the like are skipped
+                            exists().where(Post.uid == rows.c.post_uid),
+                            exists().where(User.uid == rows.c.liker_uid),
+                        ),
+                    )
+                    .on_conflict_do_nothing(
+                        index_elements=[Like.post_uid, Like.liker_uid]
+                    )
+                )
+            await session.commit()
+        return len(actions)
+
+    async def _flush(self, entries: list[tuple[bytes, dict]]) -> None:
+        if not entries:
+            return
+        try:
+            self._flushed_pairs += await self.apply(entries)
+            self._flushed_batches += 1
+        except Exception as e:
+            # left pending, they are claimed again once idle
+            print(f"Error while flushing likes: {e}")
+            self._failed_batches += 1
+            return
+        ids = [entry_id for entry_id, _ in entries]
+        await redis.xack(LIKE_EVENTS_STREAM, LIKE_FLUSHERS_GROUP, *ids)
+        await redis.xdel(LIKE_EVENTS_STREAM, *ids)
+
+    async def run(self) -> None:
+        await self._ensure_group()
+        while True:
+            try:
+                _, claimed, _ = await redis.xautoclaim(
+                    LIKE_EVENTS_STREAM,
+                    LIKE_FLUSHERS_GROUP,
+                    self.consumer,
+                    min_idle_time=CLAIM_IDLE_MS,
+                    start_id="0-0",
+                    count=self.batch_size,
+                )
+                await self._flush(claimed)
+                streams = await redis.xreadgroup(
+                    LIKE_FLUSHERS_GROUP,
+                    self.consumer,
+                    {LIKE_EVENTS_STREAM: ">"},
+                    count=self.batch_size,
+                )
+                read = 0
+                for _, entries in streams:
+                    await self._flush(entries)
+                    read += len(entries)
+                if read < self.batch_size:
+                    # caught up, let the next batch build up
+                    await asyncio.sleep(self.interval_ms / 1000)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error in like flusher: {e}")
+                await asyncio.sleep(self.interval_ms / 1000)
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def metrics(self) -> dict:
+        return {
+            "flushed_batches": self._flushed_batches,
+            "flushed_pairs": self._flushed_pairs,
+            "failed_batches": self._failed_batches,
+        }
+
+
+like_flusher = LikeFlusher(
+    batch_size=Config.LIKES_FLUSH_BATCH_SIZE,
+    interval_ms=Config.LIKES_FLUSH_INTERVAL_MS,
+)
+register_metrics("like_flusher", like_flusher.metrics)
@@ -2,10 +2,12 @@ from fastapi import APIRouter, Depends, Query
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from typing import Annotated
+from uuid import UUID
 
 from core.database.main import get_session
-from core.schemas import GeneralResponseModel
-from src.auth.dependencies import access_token_bearer
+from core.schemas import GeneralResponseModel, PageModel, UserCardModel
+from src.auth.dependencies import access_token_bearer, get_current_principal
+from src.auth.schemas import PrincipalModel
 from .service import like_service
 
 
@@ -14,13 +16,19 @@ like_router = APIRouter()
 
 @like_router.post("/like-and-unlike-post", response_model=GeneralResponseModel)
 async def add_like_to_post(
-    user_data: Annotated[dict, Depends(access_token_bearer)],
+    principal: Annotated[PrincipalModel, Depends(get_current_principal)],
     post_uid: Annotated[str, Query()],
     session: Annotated[AsyncSession, Depends(get_session)],
 ):
-    return await like_service.like_and_unlike_post(user_data, post_uid, session)
+    return await like_service.like_and_unlike_post(principal, post_uid, session)
 
 
-# @like_router.get("/get-all-likers")
-# async def get_all_likers_of_post():
-#     pass
+@like_router.get("/get-all-likers", response_model=PageModel[UserCardModel])
+async def get_all_likers_of_post(
+    post_uid: Annotated[UUID, Query()],
+    _: Annotated[dict, Depends(access_token_bearer)],
+    session: Annotated[AsyncSession, Depends(get_session)],
+    cursor: Annotated[str | None, Query()] = None,
+    limit: Annotated[int, Query(ge=1, le=50)] = 20,
+):
+    return await like_service.get_likers(post_uid, session, cursor, limit)
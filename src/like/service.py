@@ -1,26 +1,88 @@
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import delete, exists, literal
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID, insert
+from sqlalchemy.exc import IntegrityError
 
-from uuid import UUID
+from uuid import UUID, uuid4
 
-from core.database.models import Like
-from core.exceptions.exceptions import InterServerException, InvalidOperation
+from core.database.models import Like, Post, User
+from core.database.redis import redis
+from core.utils.pagination import encode_cursor, decode_cursor
+from src.auth.schemas import PrincipalModel
+from src.config import Config
+from core.exceptions.exceptions import (
+    InterServerException,
+    InvalidOperation,
+    PostNotFound,
+    InvalidCursor,
+)
 
+LIKE_EVENTS_STREAM = "like-events"
+# likers staged into redis per command while a post is warmed
+WARM_CHUNK_SIZE = 5000
+STAGED_LIKERS_SECONDS = 60
+
+# swaps the staged likers of a post in and replays the toggles not flushed yet
+# on them (ARGV after the ttl, liker and action pairs oldest first), unless an
+# other request warmed the post already
+WARM_LIKES_SCRIPT = """
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    redis.call('DEL', KEYS[3])
+    return 0
+end
+if redis.call('EXISTS', KEYS[3]) == 1 then
+    redis.call('RENAME', KEYS[3], KEYS[1])
+else
+    redis.call('DEL', KEYS[1])
+end
+for i = 2, #ARGV, 2 do
+    if ARGV[i + 1] == 'like' then
+        redis.call('SADD', KEYS[1], ARGV[i])
+    else
+        redis.call('SREM', KEYS[1], ARGV[i])
+    end
+end
+redis.call('SET', KEYS[2], redis.call('SCARD', KEYS[1]), 'EX', ARGV[1])
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return 1
+"""
+
+# toggles the like and records it for the flusher in one atomic step
+TOGGLE_LIKE_SCRIPT = """
+local action
+local count
+if redis.call('SISMEMBER', KEYS[1], ARGV[1]) == 1 then
+    redis.call('SREM', KEYS[1], ARGV[1])
+    count = redis.call('DECR', KEYS[2])
+    action = 'unlike'
+else
+    redis.call('SADD', KEYS[1], ARGV[1])
+    count = redis.call('INCR', KEYS[2])
+    action = 'like'
+end
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+redis.call(
+    'XADD', KEYS[3], '*',
+    'post_uid', ARGV[2], 'liker_uid', ARGV[1], 'action', action
+)
+return {action, count}
+"""
+
+warm_likes_script = redis.register_script(WARM_LIKES_SCRIPT)
+toggle_like_script = redis.register_script(TOGGLE_LIKE_SCRIPT)
+
+
+def get_likers_key(post_uid) -> str:
+    return f"likes:{post_uid}:users"
+
+
+def get_like_count_key(post_uid) -> str:
+    return f"likes:{post_uid}:count"
 
-class LikeService:
-    async def get_like_by_liker_uid(
-        self,
-        liker_uid: UUID,
-        session: AsyncSession,
-    ):
-        try:
-            statement = select(Like).where(Like.liker_uid == liker_uid)
-            result = await session.exec(statement)
-            return result.first()
-        except Exception as e:
-            print(e)
-            raise InterServerException()
 
+class LikeService:
     async def get_like_by_uid(
         self,
         like_uid: UUID,
@@ -34,27 +96,225 @@ class LikeService:
             print(e)
             raise InterServerException()
 
+    async def toggle_like(
+        self, liker_uid: UUID, post_uid: UUID, session: AsyncSession
+    ) -> bool:
+        """likes or unlikes in one statement, returns whether the post is
+        liked now. The unique (post_uid, liker_uid) index settles concurrent
+        toggles of the same user"""
+        deleted = (
+            delete(Like)
+            .where(Like.post_uid == post_uid, Like.liker_uid == liker_uid)
+            .returning(Like.uid)
+            .cte("deleted")
+        )
+        inserted = (
+            insert(Like)
+            .from_select(
+                ["uid", "post_uid", "liker_uid"],
+                select(
+                    literal(uuid4(), PG_UUID),
+                    literal(post_uid, PG_UUID),
+                    literal(liker_uid, PG_UUID),
+                ).where(~exists(select(deleted.c.uid))),
+            )
+            .on_conflict_do_nothing(index_elements=[Like.post_uid, Like.liker_uid])
+            .returning(Like.uid)
+            .cte("inserted")
+        )
+        result = await session.exec(
+            select(
+                exists(select(deleted.c.uid)).label("unliked"),
+                exists(select(inserted.c.uid)).label("liked"),
+            )
+        )
+        unliked, _ = result.one()
+        await session.commit()
+        # a conflicting insert means a concurrent toggle liked it already
+        return not unliked
+
+    async def _get_unflushed_toggles(self, post_uid: UUID) -> list[str]:
+        """liker and action pairs of the toggles of the post the flusher has
+        not written yet, oldest first. The stream only holds unflushed
+        toggles, so it stays as short as the flusher lag"""
+        post = str(post_uid).encode()
+        toggles = []
+        start = "-"
+        while True:
+            entries = await redis.xrange(
+                LIKE_EVENTS_STREAM, min=start, count=WARM_CHUNK_SIZE
+            )
+            for _, fields in entries:
+                # toggles recorded before events carried their action are lost
+                if fields[b"post_uid"] == post and b"action" in fields:
+                    toggles += [fields[b"liker_uid"], fields[b"action"]]
+            if len(entries) < WARM_CHUNK_SIZE:
+                return toggles
+            start = b"(" + entries[-1][0]
+
+    async def _warm_likes(self, post_uid: UUID, session: AsyncSession) -> None:
+        """loads the likers of a post into redis when it is not cached. Toggles
+        the flusher has not written yet are read before the database, a toggle
+        flushed meanwhile is in both and replaying it changes nothing"""
+        if await redis.exists(get_like_count_key(post_uid)):
+            return
+        result = await session.exec(select(Post.uid).where(Post.uid == post_uid))
+        if result.first() is None:
+            raise PostNotFound()
+        toggles = await self._get_unflushed_toggles(post_uid)
+        staged_key = f"{get_likers_key(post_uid)}:staged:{uuid4()}"
+        likers = await session.stream_scalars(
+            select(Like.liker_uid).where(Like.post_uid == post_uid)
+        )
+        async for chunk in likers.partitions(WARM_CHUNK_SIZE):
+            pipeline = redis.pipeline(transaction=False)
+            pipeline.sadd(staged_key, *[str(liker_uid) for liker_uid in chunk])
+            pipeline.expire(staged_key, STAGED_LIKERS_SECONDS)
+            await pipeline.execute()
+        await warm_likes_script(
+            keys=[
+                get_likers_key(post_uid),
+                get_like_count_key(post_uid),
+                staged_key,
+            ],
+            args=[Config.LIKES_CACHE_SECONDS, *toggles],
+        )
+
+    async def _toggle_cached_like(
+        self, liker_uid: UUID, post_uid: UUID, session: AsyncSession
+    ) -> dict:
+        """records the toggle in redis only, the like flusher writes it to the
+        database later"""
+        await self._warm_likes(post_uid, session)
+        action, _ = await toggle_like_script(
+            keys=[
+                get_likers_key(post_uid),
+                get_like_count_key(post_uid),
+                LIKE_EVENTS_STREAM,
+            ],
+            args=[str(liker_uid), str(post_uid), Config.LIKES_CACHE_SECONDS],
+        )
+        if action == b"unlike":
+            return {"message": "unlike the post"}
+        return {"message": "successfully liked the post"}
+
     async def like_and_unlike_post(
         self,
-        user_data: dict,
+        principal: PrincipalModel,
         post_uid: str,
         session: AsyncSession,
     ):
         try:
-            liker_uid = UUID(user_data["user_data"]["uid"])
-            already_liked_detail = await self.get_like_by_liker_uid(liker_uid, session)
-            if already_liked_detail is not None:
-                await session.delete(already_liked_detail)
-                await session.commit()
+            liker_uid = principal.uid
+            if Config.LIKES_WRITE_BEHIND:
+                return await self._toggle_cached_like(
+                    liker_uid, UUID(post_uid), session
+                )
+            if not await self.toggle_like(liker_uid, UUID(post_uid), session):
                 return {"message": "unlike the post"}
-            new_like = Like(liker_uid=liker_uid, post_uid=post_uid)
-            session.add(new_like)
-            await session.commit()
             return {"message": "successfully liked the post"}
 
+        except IntegrityError:
+            # the post does not exist
+            raise PostNotFound()
+        except PostNotFound:
+            raise
+        except Exception as e:
+            print(e)
+            raise InterServerException()
+
+    async def get_likers(
+        self,
+        post_uid: UUID,
+        session: AsyncSession,
+        cursor: str | None = None,
+        limit: int = 20,
+    ) -> dict:
+        """page of the users that like the post. With write-behind likes it
+        shows the likes flushed so far"""
+        try:
+            statement = (
+                select(
+                    User.uid,
+                    User.username,
+                    User.full_name,
+                    User.profile_url,
+                    Like.uid.label("like_uid"),
+                )
+                .join(Like, Like.liker_uid == User.uid)
+                .where(Like.post_uid == post_uid)
+                .order_by(Like.uid.desc())
+                .limit(limit + 1)
+            )
+            if cursor is not None:
+                (last_like_uid,) = decode_cursor(cursor, UUID)
+                statement = statement.where(Like.uid < last_like_uid)
+            result = await session.exec(statement)
+            rows = result.all()
+
+            next_cursor = None
+            if len(rows) > limit:
+                rows = rows[:limit]
+                next_cursor = encode_cursor([rows[-1].like_uid])
+            return {"items": rows, "next_cursor": next_cursor}
+        except InvalidCursor:
+            raise
         except Exception as e:
             print(e)
             raise InterServerException()
 
+    async def get_liked_post_uids(
+        self, viewer_uid: UUID, post_uids: list[UUID], session: AsyncSession
+    ) -> set[UUID]:
+        """the posts among post_uids the viewer likes. Posts cached in redis
+        are answered from their likers set, which is ahead of the database
+        while likes are written behind"""
+        result = await session.exec(
+            select(Like.post_uid).where(
+                Like.liker_uid == viewer_uid, Like.post_uid.in_(post_uids)
+            )
+        )
+        liked = set(result.all())
+        if not Config.LIKES_WRITE_BEHIND:
+            return liked
+        pipeline = redis.pipeline(transaction=False)
+        for post_uid in post_uids:
+            pipeline.exists(get_like_count_key(post_uid))
+            pipeline.sismember(get_likers_key(post_uid), str(viewer_uid))
+        replies = await pipeline.execute()
+        for index, post_uid in enumerate(post_uids):
+            if not replies[index * 2]:
+                continue
+            if replies[index * 2 + 1]:
+                liked.add(post_uid)
+            else:
+                liked.discard(post_uid)
+        return liked
+
+    async def apply_cached_likes(self, posts: list, viewer_uid: UUID | None = None):
+        """replaces the database like counts (and liked_by_me) of summary rows
+        with the redis ones, which are ahead of the database while likes are
+        written behind. Posts nobody liked recently keep their database values.
+        Rows are returned as dicts either way"""
+        if not Config.LIKES_WRITE_BEHIND or not posts:
+            return [dict(post._mapping) for post in posts]
+        pipeline = redis.pipeline(transaction=False)
+        for post in posts:
+            pipeline.get(get_like_count_key(post.uid))
+            if viewer_uid is not None:
+                pipeline.sismember(get_likers_key(post.uid), str(viewer_uid))
+        replies = await pipeline.execute()
+        step = 1 if viewer_uid is None else 2
+        cached_posts = []
+        for index, post in enumerate(posts):
+            post = dict(post._mapping)
+            count = replies[index * step]
+            if count is not None:
+                post["likes_count"] = int(count)
+                if viewer_uid is not None:
+                    post["liked_by_me"] = bool(replies[index * step + 1])
+            cached_posts.append(post)
+        return cached_posts
+
 
 like_service = LikeService()
@@ -1,16 +1,51 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Depends
+from fastapi.staticfiles import StaticFiles
+
+from contextlib import asynccontextmanager
+import asyncio
 
 from core.exceptions.exception_registration import register_exception_handlers
+from core.utils.metrics import collect_metrics, verify_metrics_token
+from core.utils.images import image_executor
+from src.auth.hashing import hashing_executor
+from src.auth.revocation import revocation_list
+from src.post.media import media_pipeline
+from src.like.flusher import like_flusher
+from src.upload.service import upload_service
+from src.config import Config
 from src.auth.routes import auth_router
 from src.post.routes import post_router
 from src.tag.routes import tag_router
 from src.comment.routes import comment_router
 from src.like.router import like_router
 from src.share.routes import share_router
+from src.upload.routes import upload_router
+from src.feed.routes import feed_router
 
 VERSION = "v1"
 BASE_URL = f"/api/{VERSION}"
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # revoked tokens would pass until the bloom filter is filled
+    await revocation_list.load()
+    revocation_listener = asyncio.create_task(revocation_list.listen())
+    revocation_rebuilder = asyncio.create_task(revocation_list.rebuild_periodically())
+    await media_pipeline.start()
+    upload_service.start()
+    if Config.LIKES_WRITE_BEHIND:
+        like_flusher.start()
+    yield
+    await like_flusher.stop()
+    await upload_service.stop()
+    await media_pipeline.stop()
+    revocation_listener.cancel()
+    revocation_rebuilder.cancel()
+    hashing_executor.shutdown()
+    image_executor.shutdown()
+
+
 app = FastAPI(
     title="Olotooto Server",
     description="This is the server for social media app",
@@ -18,6 +53,7 @@ app = FastAPI(
     contact={"email": "sunarsushil100@gmail.com"},
     version=VERSION,
     root_path=BASE_URL,
+    lifespan=lifespan,
 )
 
 # registering all the exceptions
@@ -30,3 +66,23 @@ app.include_router(tag_router, prefix="/tags", tags=["tags"])
 app.include_router(comment_router, prefix="/comments", tags=["comments"])
 app.include_router(like_router, prefix="/likes", tags=["likes"])
 app.include_router(share_router, prefix="/shares", tags=["shares"])
+app.include_router(upload_router, prefix="/uploads", tags=["uploads"])
+app.include_router(feed_router, prefix="/feed", tags=["feed"])
+
+if Config.STORAGE_BACKEND == "local":
+    # serve the files of the local storage stand-in
+    app.mount(
+        Config.LOCAL_STORAGE_BASE_URL,
+        StaticFiles(directory=Config.LOCAL_STORAGE_DIR, check_dir=False),
+    )
+
+
+if Config.METRICS_TOKEN is not None:
+
+    @app.get(
+        "/metrics",
+        include_in_schema=False,
+        dependencies=[Depends(verify_metrics_token)],
+    )
+    async def get_metrics():
+        return collect_metrics()
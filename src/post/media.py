@@ -0,0 +1,432 @@
+from fastapi import UploadFile
+from pydantic import BaseModel
+from sqlmodel import select
+from sqlalchemy import func, update
+
+import asyncio
+import io
+import os
+import time
+from pathlib import Path
+from typing import Literal
+from uuid import UUID
+
+from core.database.main import Session, async_engine
+from core.database.redis import delete_data_from_redis
+from core.database.models import Post, User
+from core.database.storage import storage
+from core.exceptions.exceptions import InterServerException, ServerBusy
+from core.utils.enums import PostStatusEnum
+from core.utils.images import create_renditions
+from core.utils.metrics import register_metrics
+from src.config import Config
+from src.auth.utils import get_principal_cache_key
+from src.feed.service import feed_service
+
+SPOOL_CHUNK_SIZE = 1024 * 1024
+# advisory lock namespace, a worker holds the lock of a post while it
+# processes it so recovering workers leave the post alone
+MEDIA_LOCK_ID = 7_310_443
+# profile pictures are spooled once per job, under <user uid>.<spool uid>
+PROFILE_SPOOL_DIR = "profiles"
+# spool files still being written end with this until they are complete
+PARTIAL_SUFFIX = ".part"
+PARTIAL_SPOOL_MAX_AGE_SECONDS = 60 * 60
+# a post spool file with no processing post was left by a failed post or by an
+# update that never committed, once this old
+ORPHANED_SPOOL_MAX_AGE_SECONDS = 60 * 60
+
+DEFAULT_PROFILE_URL = User.__table__.c.profile_url.server_default.arg
+
+
+def get_post_path(full_name: str):
+    return f"users/{full_name}/posts"
+
+
+def get_profile_path(full_name: str):
+    return f"users/{full_name}/profiles"
+
+
+def get_stored_image_urls(
+    image_url: str | None, renditions: dict[str, str] | None
+) -> list[str]:
+    """every stored file of an image, older images have no renditions"""
+    if renditions:
+        return list(renditions.values())
+    return [image_url] if image_url else []
+
+
+class MediaJob(BaseModel):
+    target: Literal["post", "profile"] = "post"
+    # uid of the post or of the user whose profile picture this is
+    target_uid: UUID
+    folder_dir: str
+    # images replaced by this post job, deleted once the new ones are stored.
+    # A profile job replaces whatever picture the user has when it stores
+    old_image_urls: list[str] = []
+    # set for profile jobs, two updates in a row must not share a spool file
+    spool_uid: UUID | None = None
+
+
+class MediaPipeline:
+    """Processes and uploads images outside of the request.
+
+    The request only spools the bytes to local disk, a post is created in the
+    processing state. Workers render the webp renditions in the image process
+    pool, upload them to the storage backend and store their urls on the post
+    (flipping it to ready or failed) or on the user. Spool files are named
+    after their target and the spool is local to the host, so on start the
+    processing posts and profile pictures whose spool file is on this host are
+    picked up again in the background. A job only runs under the advisory lock of its spool file and
+    while there is still something to do, so every worker may queue it again
+    safely. Requests are turned away with ServerBusy while the queue is full.
+    """
+
+    def __init__(self, spool_dir: str, workers: int, queue_size: int):
+        self.spool_dir = Path(spool_dir)
+        self.workers = workers
+        self._queue: asyncio.Queue[MediaJob] = asyncio.Queue(maxsize=queue_size)
+        self._tasks: list[asyncio.Task] = []
+        self._recovery: asyncio.Task | None = None
+        self._rejected = 0
+        self._completed = 0
+        self._failed = 0
+
+    def get_spool_path(self, target_uid: UUID, spool_uid: UUID | None = None) -> Path:
+        if spool_uid is None:
+            return self.spool_dir / str(target_uid)
+        return self.spool_dir / PROFILE_SPOOL_DIR / f"{target_uid}.{spool_uid}"
+
+    def get_job_spool_path(self, job: MediaJob) -> Path:
+        return self.get_spool_path(job.target_uid, job.spool_uid)
+
+    def _write_chunk(self, path: Path, chunk: bytes, mode: str) -> None:
+        with open(path, mode) as file:
+            file.write(chunk)
+
+    async def spool(
+        self, file: UploadFile, target_uid: UUID, spool_uid: UUID | None = None
+    ) -> None:
+        try:
+            path = self.get_spool_path(target_uid, spool_uid)
+            partial_path = path.with_name(path.name + PARTIAL_SUFFIX)
+            await asyncio.to_thread(path.parent.mkdir, parents=True, exist_ok=True)
+            mode = "wb"
+            while chunk := await file.read(SPOOL_CHUNK_SIZE):
+                await asyncio.to_thread(self._write_chunk, partial_path, chunk, mode)
+                mode = "ab"
+            # recovery only ever sees complete files
+            await asyncio.to_thread(os.replace, partial_path, path)
+        except Exception as e:
+            print(f"Error while spooling file: {e}")
+            raise InterServerException()
+
+    async def discard(self, target_uid: UUID, spool_uid: UUID | None = None) -> None:
+        await asyncio.to_thread(self.get_spool_path(target_uid, spool_uid).unlink, True)
+
+    def submit(self, job: MediaJob) -> None:
+        """queues a job of a request, a full queue is the backpressure on
+        uploads"""
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self._rejected += 1
+            raise ServerBusy()
+
+    async def fail_post(self, post_uid: UUID) -> None:
+        """settles a committed post whose job could not be queued, so it is
+        not left processing"""
+        try:
+            await self._set_post_status(post_uid, PostStatusEnum.failed)
+        except Exception as e:
+            print(f"Error while failing post {post_uid}: {e}")
+
+    async def _set_post_status(
+        self,
+        post_uid: UUID,
+        status: PostStatusEnum,
+        image_urls: dict[str, str] | None = None,
+    ) -> bool:
+        values = {"status": status}
+        if image_urls is not None:
+            values["post_image_url"] = image_urls["full"]
+            values["image_renditions"] = image_urls
+        async with Session() as session:
+            # a post some other worker already settled is left as it is
+            result = await session.exec(
+                update(Post)
+                .where(
+                    Post.uid == post_uid,
+                    Post.status == PostStatusEnum.processing,
+                )
+                .values(**values)
+            )
+            await session.commit()
+            return result.rowcount > 0
+
+    async def _set_profile_image(
+        self, user_uid: UUID, image_urls: dict[str, str]
+    ) -> list[str] | None:
+        """stores the new picture, returns the urls of the one it replaced or
+        None when the user is gone. The old picture is read under the row lock
+        so overlapping updates each replace the picture stored before them"""
+        async with Session() as session:
+            result = await session.exec(
+                select(User.profile_url, User.profile_renditions)
+                .where(User.uid == user_uid)
+                .with_for_update()
+            )
+            old_image = result.first()
+            if old_image is None:
+                return None
+            await session.exec(
+                update(User)
+                .where(User.uid == user_uid)
+                .values(
+                    profile_url=image_urls["full"],
+                    profile_renditions=image_urls,
+                )
+            )
+            await session.commit()
+        # the cached principal carries the profile url
+        await delete_data_from_redis(get_principal_cache_key(user_uid))
+        old_profile_url, old_renditions = old_image
+        if old_profile_url == DEFAULT_PROFILE_URL:
+            # the default picture is not ours to delete
+            return []
+        return get_stored_image_urls(old_profile_url, old_renditions)
+
+    async def _delete_images(self, urls: list[str], folder_dir: str) -> None:
+        for url in urls:
+            try:
+                await storage.delete(url, folder_dir)
+            except Exception as e:
+                # a leftover file is not worth failing the job for
+                print(f"Error while deleting old image {url}: {e}")
+
+    async def _upload_renditions(
+        self, job: MediaJob, image_urls: dict[str, str]
+    ) -> None:
+        """fills image_urls as the renditions are uploaded, so the caller can
+        delete the ones already stored when a later one fails"""
+        data = await asyncio.to_thread(self.get_job_spool_path(job).read_bytes)
+        renditions = await create_renditions(data)
+        for name, rendition in renditions.items():
+            image_urls[name] = await storage.upload(
+                io.BytesIO(rendition), job.folder_dir
+            )
+
+    async def _process(self, job: MediaJob) -> None:
+        image_urls = {}
+        try:
+            await self._upload_renditions(job, image_urls)
+            if job.target == "post":
+                stored = await self._set_post_status(
+                    job.target_uid, PostStatusEnum.ready, image_urls
+                )
+                old_image_urls = job.old_image_urls
+            else:
+                old_image_urls = await self._set_profile_image(
+                    job.target_uid, image_urls
+                )
+                stored = old_image_urls is not None
+            if stored:
+                await self._delete_images(old_image_urls, job.folder_dir)
+                if job.target == "post":
+                    await feed_service.fan_out(job.target_uid)
+            else:
+                # target was deleted while we were uploading
+                await self._delete_images(list(image_urls.values()), job.folder_dir)
+            self._completed += 1
+        except Exception as e:
+            print(f"Error while processing media of {job.target} {job.target_uid}: {e}")
+            self._failed += 1
+            await self._delete_images(list(image_urls.values()), job.folder_dir)
+            if job.target == "post":
+                await self._set_post_status(job.target_uid, PostStatusEnum.failed)
+        finally:
+            await self.discard(job.target_uid, job.spool_uid)
+
+    async def _process_claimed_post(self, job: MediaJob) -> None:
+        async with Session() as session:
+            result = await session.exec(
+                select(Post.status).where(Post.uid == job.target_uid)
+            )
+            status = result.first()
+        if status != PostStatusEnum.processing:
+            # done by an other worker, a spool file left now belongs to an
+            # update that is not committed yet
+            return
+        if not await asyncio.to_thread(self.get_spool_path(job.target_uid).exists):
+            print(f"Spool file of post {job.target_uid} is gone")
+            self._failed += 1
+            await self._set_post_status(job.target_uid, PostStatusEnum.failed)
+            return
+        await self._process(job)
+
+    async def process(self, job: MediaJob) -> None:
+        lock = (MEDIA_LOCK_ID, func.hashtext(str(self.get_job_spool_path(job))))
+        # the lock is session level, autocommit keeps the connection from
+        # sitting idle in a transaction while the image is processed
+        async with async_engine.connect() as connection:
+            connection = await connection.execution_options(
+                isolation_level="AUTOCOMMIT"
+            )
+            if not await connection.scalar(select(func.pg_try_advisory_lock(*lock))):
+                # an other worker is processing the job right now
+                return
+            try:
+                if job.target == "post":
+                    await self._process_claimed_post(job)
+                elif await asyncio.to_thread(self.get_job_spool_path(job).exists):
+                    await self._process(job)
+                # else an other worker has stored the profile picture already
+            finally:
+                await connection.scalar(select(func.pg_advisory_unlock(*lock)))
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self.process(job)
+            except Exception as e:
+                print(f"Error in media worker: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _list_spool_files(self, directory: Path) -> list[Path]:
+        """the complete spool files of directory, partial ones left by a
+        crashed request are removed once old"""
+        if not directory.is_dir():
+            return []
+        paths = []
+        for path in directory.iterdir():
+            if not path.is_file():
+                continue
+            if path.name.endswith(PARTIAL_SUFFIX):
+                age = time.time() - path.stat().st_mtime
+                if age > PARTIAL_SPOOL_MAX_AGE_SECONDS:
+                    path.unlink(missing_ok=True)
+                continue
+            paths.append(path)
+        return paths
+
+    def _list_post_spools(self) -> dict[UUID, float]:
+        """post uid -> age of the post spool files"""
+        spools = {}
+        for path in self._list_spool_files(self.spool_dir):
+            try:
+                spools[UUID(path.name)] = time.time() - path.stat().st_mtime
+            except ValueError:
+                print(f"Unknown file in the post spool: {path.name}")
+        return spools
+
+    async def recover(self) -> None:
+        """queue again the processing posts spooled on this host, those left
+        by a stopped worker are processed again and the others skipped. Posts
+        spooled on an other host are left to it"""
+        spools = await asyncio.to_thread(self._list_post_spools)
+        if not spools:
+            return
+        async with Session() as session:
+            result = await session.exec(
+                select(
+                    Post.uid,
+                    Post.post_image_url,
+                    Post.image_renditions,
+                    User.full_name,
+                )
+                .join(User, User.uid == Post.user_uid)
+                .where(
+                    Post.uid.in_(spools),
+                    Post.status == PostStatusEnum.processing,
+                )
+            )
+            pending = result.all()
+        for post_uid, image_url, image_renditions, full_name in pending:
+            # posts processed by a live worker are skipped once claimed
+            await self._queue.put(
+                MediaJob(
+                    target_uid=post_uid,
+                    folder_dir=get_post_path(full_name),
+                    old_image_urls=get_stored_image_urls(image_url, image_renditions),
+                )
+            )
+        pending_uids = {post_uid for post_uid, *_ in pending}
+        for post_uid, age in spools.items():
+            if post_uid not in pending_uids and age > ORPHANED_SPOOL_MAX_AGE_SECONDS:
+                await self.discard(post_uid)
+
+    def _list_profile_spools(self) -> list[tuple[UUID, UUID]]:
+        """(user uid, spool uid) of the complete profile spool files"""
+        spools = []
+        for path in self._list_spool_files(self.spool_dir / PROFILE_SPOOL_DIR):
+            try:
+                user_uid, spool_uid = path.name.split(".")
+                spools.append((UUID(user_uid), UUID(spool_uid)))
+            except ValueError:
+                print(f"Unknown file in the profile spool: {path.name}")
+        return spools
+
+    async def recover_profiles(self) -> None:
+        """queue again the profile pictures still in the spool, those of
+        deleted users are dropped"""
+        spools = await asyncio.to_thread(self._list_profile_spools)
+        if not spools:
+            return
+        async with Session() as session:
+            result = await session.exec(
+                select(User.uid, User.full_name).where(
+                    User.uid.in_({user_uid for user_uid, _ in spools})
+                )
+            )
+            full_names = dict(result.all())
+        for user_uid, spool_uid in spools:
+            if user_uid not in full_names:
+                await self.discard(user_uid, spool_uid)
+                continue
+            await self._queue.put(
+                MediaJob(
+                    target="profile",
+                    target_uid=user_uid,
+                    spool_uid=spool_uid,
+                    folder_dir=get_profile_path(full_names[user_uid]),
+                )
+            )
+
+    async def _recover_all(self) -> None:
+        # waits for room in the queue, a backlog larger than the queue is
+        # queued as the workers drain it
+        try:
+            await self.recover()
+            await self.recover_profiles()
+        except Exception as e:
+            print(f"Error while recovering media jobs: {e}")
+
+    async def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._recovery = asyncio.create_task(self._recover_all())
+
+    async def stop(self) -> None:
+        tasks = self._tasks + ([self._recovery] if self._recovery else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+        self._recovery = None
+
+    def metrics(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "rejected": self._rejected,
+            "completed": self._completed,
+            "failed": self._failed,
+        }
+
+
+media_pipeline = MediaPipeline(
+    spool_dir=Config.MEDIA_SPOOL_DIR,
+    workers=Config.MEDIA_WORKERS,
+    queue_size=Config.MEDIA_QUEUE_SIZE,
+)
+register_metrics("media", media_pipeline.metrics)
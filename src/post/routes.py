@@ -2,11 +2,26 @@ from fastapi import APIRouter, UploadFile, Body, File, Form, Path, Depends
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from typing import Annotated
+from uuid import UUID
 
 from core.database.main import get_session
-from core.schemas import PostModel, GeneralResponseModel
-from src.auth.dependencies import access_token_bearer
-from .schemas import PostCreateModel, PostUpdateModel
+from core.utils.enums import PostLoadProfile
+from core.schemas import PostModel, PostDetailModel, GeneralResponseModel
+from src.auth.dependencies import (
+    access_token_bearer,
+    get_current_principal,
+    get_read_session,
+    get_user_session,
+)
+from src.auth.schemas import PrincipalModel
+from .schemas import (
+    PostCreateModel,
+    PostUpdateModel,
+    PostUploadResponseModel,
+    PostStatusModel,
+    ViewerStateRequestModel,
+    ViewerStateModel,
+)
 from .service import post_service
 
 
@@ -15,56 +30,95 @@ post_router = APIRouter()
 
 @post_router.post(
     "/upload-post",
-    response_model=GeneralResponseModel,
+    response_model=PostUploadResponseModel,
     status_code=201,
 )
 async def upload_post(
     caption: Annotated[str, Form()],
     tags: Annotated[list[str], Form()],
-    post_image_file: Annotated[UploadFile, File()],
-    user_data: Annotated[dict, Depends(access_token_bearer)],
+    principal: Annotated[PrincipalModel, Depends(get_current_principal)],
     session: Annotated[AsyncSession, Depends(get_session)],
+    post_image_file: Annotated[UploadFile | None, File()] = None,
+    upload_id: Annotated[UUID | None, Form()] = None,
 ):
     post_data = PostCreateModel(
         caption=caption,
         post_image_file=post_image_file,
+        upload_id=upload_id,
         tags=tags,
     )
     return await post_service.upload_post(
-        user_data=user_data,
+        principal=principal,
         post_create_data=post_data,
         session=session,
     )
 
 
-@post_router.get("/{post_uid}", response_model=PostModel)
-async def get_post_by_uid(
-    post_uid: Annotated[str, Path()],
+@post_router.post("/viewer-state", response_model=list[ViewerStateModel])
+async def get_viewer_states(
+    data: Annotated[ViewerStateRequestModel, Body()],
+    principal: Annotated[PrincipalModel, Depends(get_current_principal)],
+    session: Annotated[AsyncSession, Depends(get_session)],
+):
+    return await post_service.get_viewer_states(
+        data.post_uids, principal.uid, session
+    )
+
+
+@post_router.get("/{post_uid}/status", response_model=PostStatusModel)
+async def get_post_status(
+    post_uid: Annotated[UUID, Path()],
     _: Annotated[dict, Depends(access_token_bearer)],
     session: Annotated[AsyncSession, Depends(get_session)],
 ):
-    return await post_service.get_post_by_uid(post_uid, session)
+    return await post_service.get_post_status(post_uid, session)
+
+
+@post_router.get("/{post_uid}/full", response_model=PostModel)
+async def get_full_post_by_uid(
+    post_uid: Annotated[str, Path()],
+    _: Annotated[dict, Depends(access_token_bearer)],
+    session: Annotated[AsyncSession, Depends(get_read_session)],
+):
+    return await post_service.get_post_by_uid(
+        post_uid, session, PostLoadProfile.full
+    )
+
+
+@post_router.get("/{post_uid}", response_model=PostDetailModel)
+async def get_post_by_uid(
+    post_uid: Annotated[UUID, Path()],
+    principal: Annotated[PrincipalModel, Depends(get_current_principal)],
+    session: Annotated[AsyncSession, Depends(get_read_session)],
+):
+    return await post_service.get_post_detail(post_uid, principal.uid, session)
 
 
 @post_router.patch("/update-post/{post_uid}")
 async def update_post(
     caption: Annotated[str, Form()],
     tags: Annotated[list[str], Form()],
-    post_image_file: Annotated[UploadFile, File()],
     post_uid: Annotated[str, Path()],
-    _: Annotated[dict, Depends(access_token_bearer)],
+    principal: Annotated[PrincipalModel, Depends(get_current_principal)],
     session: Annotated[AsyncSession, Depends(get_session)],
+    post_image_file: Annotated[UploadFile | None, File()] = None,
+    upload_id: Annotated[UUID | None, Form()] = None,
 ):
     post_update_data = PostUpdateModel(
-        caption=caption, tags=tags, post_image_file=post_image_file
+        caption=caption,
+        tags=tags,
+        post_image_file=post_image_file,
+        upload_id=upload_id,
+    )
+    return await post_service.update_post(
+        post_uid, principal, post_update_data, session
     )
-    return await post_service.update_post(post_uid, post_update_data, session)
 
 
 @post_router.delete("/delete-post/{post_uid}", status_code=204)
 async def delete_post(
     post_uid: Annotated[str, Path()],
     _: Annotated[dict, Depends(access_token_bearer)],
-    session: Annotated[AsyncSession, Depends(get_session)],
+    session: Annotated[AsyncSession, Depends(get_user_session)],
 ):
     await post_service.delete_post(post_uid, session)
@@ -1,17 +1,45 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from fastapi import UploadFile
 
 from datetime import datetime
 from uuid import UUID
 
+from core.utils.enums import PostStatusEnum
+
 
 class PostCreateModel(BaseModel):
     caption: str
     tags: list[str] | None = None
-    post_image_file: UploadFile
+    post_image_file: UploadFile | None = None
+    # completed chunked upload used instead of post_image_file
+    upload_id: UUID | None = None
 
 
 class PostUpdateModel(BaseModel):
     caption: str | None = None
     tags: list[str] | None = None
     post_image_file: UploadFile | None = None
+    upload_id: UUID | None = None
+
+
+class PostUploadResponseModel(BaseModel):
+    message: str
+    post_uid: UUID
+    status: PostStatusEnum
+
+
+class PostStatusModel(BaseModel):
+    uid: UUID
+    status: PostStatusEnum
+    post_image_url: str | None
+
+
+class ViewerStateRequestModel(BaseModel):
+    post_uids: list[UUID] = Field(min_length=1, max_length=100)
+
+
+class ViewerStateModel(BaseModel):
+    post_uid: UUID
+    liked: bool
+    shared: bool
+    following_author: bool
@@ -1,33 +1,51 @@
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel import select
+from sqlalchemy import delete, update
 
-from uuid import UUID
+from uuid import UUID, uuid4
 from datetime import datetime
 
 from .schemas import PostCreateModel, PostUpdateModel
-from core.database.models import Post, User
-from core.database.cloudinary import upload_file, delete_file
-from src.auth.service import auth_service
+from core.database.models import (
+    Post,
+    User,
+    Like,
+    Comment,
+    Share,
+    UserLinkModel,
+    TagAndPostLinkModel,
+)
+from core.database.loaders import get_load_options
+from core.utils.enums import PostStatusEnum, PostLoadProfile
+from src.auth.schemas import PrincipalModel
+from .summary import get_post_detail_columns
+from .media import media_pipeline, MediaJob, get_post_path, get_stored_image_urls
 from src.tag.service import tag_service
+from src.upload.service import upload_service
+from src.like.service import like_service
 from core.exceptions.exceptions import (
     InterServerException,
-    UserNotFound,
     PostNotFound,
-    TagAlreadyExist,
+    InvalidOperation,
+    UploadNotFound,
+    UploadIncomplete,
+    ServerBusy,
 )
-from core.database.cloudinary import upload_file
-
-
-def get_post_path(full_name: str):
-    return f"users/{full_name}/posts"
 
 
 class PostService:
     async def get_post_by_uid(
-        self, post_uid: UUID, session: AsyncSession
+        self,
+        post_uid: UUID,
+        session: AsyncSession,
+        profile: PostLoadProfile = PostLoadProfile.bare,
     ) -> Post | None:
         try:
-            statement = select(Post).where(Post.uid == post_uid)
+            statement = (
+                select(Post)
+                .where(Post.uid == post_uid)
+                .options(*get_load_options(Post, profile))
+            )
             result = await session.exec(statement)
             return result.first()
 
@@ -35,46 +53,144 @@ class PostService:
             print(e)
             raise InterServerException()
 
+    async def get_post_detail(
+        self, post_uid: UUID, viewer_uid: UUID, session: AsyncSession
+    ):
+        """the post with counts instead of its likes, shares and comments"""
+        try:
+            statement = select(*get_post_detail_columns(viewer_uid)).where(
+                Post.uid == post_uid
+            )
+            result = await session.exec(statement)
+            post = result.first()
+            if post is None:
+                raise PostNotFound()
+            (post,) = await like_service.apply_cached_likes([post], viewer_uid)
+            return post
+        except PostNotFound:
+            raise
+        except Exception as e:
+            print(e)
+            raise InterServerException()
+
+    async def get_viewer_states(
+        self, post_uids: list[UUID], viewer_uid: UUID, session: AsyncSession
+    ) -> list[dict]:
+        """whether the viewer liked and shared each post and follows its
+        author, one membership query per relation whatever the number of
+        posts. Unknown posts are left out"""
+        try:
+            post_uids = list(dict.fromkeys(post_uids))
+            result = await session.exec(
+                select(Post.uid, Post.user_uid).where(Post.uid.in_(post_uids))
+            )
+            authors = dict(result.all())
+            if not authors:
+                return []
+            post_uids = [post_uid for post_uid in post_uids if post_uid in authors]
+
+            liked = await like_service.get_liked_post_uids(
+                viewer_uid, post_uids, session
+            )
+            result = await session.exec(
+                select(Share.post_uid).where(
+                    Share.sharer_uid == viewer_uid, Share.post_uid.in_(post_uids)
+                )
+            )
+            shared = set(result.all())
+            result = await session.exec(
+                select(UserLinkModel.user_uid).where(
+                    UserLinkModel.follower_uid == viewer_uid,
+                    UserLinkModel.user_uid.in_(set(authors.values())),
+                )
+            )
+            followed = set(result.all())
+            return [
+                {
+                    "post_uid": post_uid,
+                    "liked": post_uid in liked,
+                    "shared": post_uid in shared,
+                    "following_author": authors[post_uid] in followed,
+                }
+                for post_uid in post_uids
+            ]
+        except Exception as e:
+            print(e)
+            raise InterServerException()
+
     async def upload_post(
         self,
-        user_data: dict,
+        principal: PrincipalModel,
         post_create_data: PostCreateModel,
         session: AsyncSession,
     ):
+        post_uid = uuid4()
+        committed = False
         try:
-            user: User | None = await auth_service.get_user_by_username(
-                user_data["user_data"]["username"], session
-            )
-            if user is None:
-                raise UserNotFound()
-            post_image_url = await upload_file(
+            # the image is uploaded by the media pipeline, the post is visible
+            # once it becomes ready
+            await upload_service.spool_image(
+                principal.uid,
+                post_uid,
                 post_create_data.post_image_file,
-                get_post_path(user.full_name),
+                post_create_data.upload_id,
             )
             new_post = Post(
+                uid=post_uid,
                 caption=post_create_data.caption,
-                post_image_url=post_image_url,
-                user_uid=user.uid,
+                user_uid=principal.uid,
+                status=PostStatusEnum.processing,
             )
             session.add(new_post)
+            await session.exec(
+                update(User)
+                .where(User.uid == principal.uid)
+                .values(posts_count=User.posts_count + 1)
+            )
+            # the post row has to exist before its tag links
+            await session.flush()
+            if post_create_data.tags:
+                await tag_service.attach_tags(
+                    post_uid, post_create_data.tags, session
+                )
             await session.commit()
+            committed = True
             await session.refresh(new_post)
-            if len(post_create_data.tags) > 0:
-                for tag in post_create_data.tags:
 
-                    await tag_service.add_tag_to_post(new_post.uid, tag, session)
-
-            return {"message": "Post created successfully"}
-        except (UserNotFound, TagAlreadyExist):
+            media_pipeline.submit(
+                MediaJob(
+                    target_uid=post_uid,
+                    folder_dir=get_post_path(principal.full_name),
+                )
+            )
+            return {
+                "message": "Post created successfully",
+                "post_uid": post_uid,
+                "status": new_post.status,
+            }
+        except (InvalidOperation, UploadNotFound, UploadIncomplete):
             raise
 
         except Exception as e:
+            if committed:
+                # the spool file stays with the committed post
+                await media_pipeline.fail_post(post_uid)
+            else:
+                await media_pipeline.discard(post_uid)
+            if isinstance(e, ServerBusy):
+                raise
             print(e)
             raise InterServerException()
 
     async def update_post(
-        self, post_uid: str, post_update_data: PostUpdateModel, session: AsyncSession
+        self,
+        post_uid: str,
+        principal: PrincipalModel,
+        post_update_data: PostUpdateModel,
+        session: AsyncSession,
     ):
+        media_job = None
+        committed = False
         try:
             post = await self.get_post_by_uid(UUID(post_uid), session)
             if not post:
@@ -82,42 +198,98 @@ class PostService:
             for k, v in post_update_data.model_dump().items():
                 if v == None:
                     continue
-                if k == "post_image_file":
-                    post_folder_path = get_post_path(post.user.full_name)
-                    await delete_file(
-                        post.post_image_url,
-                        post_folder_path,
+                if k in ("post_image_file", "upload_id"):
+                    if media_job is not None:
+                        # the image is given both ways
+                        raise InvalidOperation()
+                    if post.status == PostStatusEnum.processing:
+                        # the previous image is still being uploaded
+                        raise InvalidOperation()
+                    result = await session.exec(
+                        select(User.full_name).where(User.uid == post.user_uid)
                     )
-                    new_profile_url = await upload_file(
+                    await upload_service.spool_image(
+                        principal.uid,
+                        post.uid,
                         post_update_data.post_image_file,
-                        post_folder_path,
+                        post_update_data.upload_id,
+                    )
+                    media_job = MediaJob(
+                        target_uid=post.uid,
+                        folder_dir=get_post_path(result.one()),
+                        old_image_urls=get_stored_image_urls(
+                            post.post_image_url, post.image_renditions
+                        ),
                     )
-                    post.post_image_url = new_profile_url
+                    post.status = PostStatusEnum.processing
                 elif k == "tags":
-                    post.tags.clear()
-                    if len(post_update_data.tags) > 0:
-                        for tag in post_update_data.tags:
-                            await tag_service.add_tag_to_post(post.uid, tag, session)
+                    await session.exec(
+                        delete(TagAndPostLinkModel).where(
+                            TagAndPostLinkModel.post_uid == post.uid
+                        )
+                    )
+                    await tag_service.attach_tags(
+                        post.uid, post_update_data.tags, session
+                    )
                 else:
                     post.caption = post_update_data.caption
             post.updated_at = datetime.now()
             await session.commit()
+            committed = True
+            if media_job is not None:
+                media_pipeline.submit(media_job)
             return {
                 "message": "Post updated successfully",
             }
-        except PostNotFound:
+        except (PostNotFound, InvalidOperation, UploadNotFound, UploadIncomplete):
             raise
 
+        except Exception as e:
+            if media_job is not None:
+                if committed:
+                    # the spool file stays with the committed post
+                    await media_pipeline.fail_post(media_job.target_uid)
+                else:
+                    await media_pipeline.discard(media_job.target_uid)
+            if isinstance(e, ServerBusy):
+                raise
+            print(e)
+            raise InterServerException()
+
+    async def get_post_status(self, post_uid: UUID, session: AsyncSession) -> dict:
+        try:
+            statement = select(Post.uid, Post.status, Post.post_image_url).where(
+                Post.uid == post_uid
+            )
+            result = await session.exec(statement)
+            post_status = result.first()
+            if post_status is None:
+                raise PostNotFound()
+            return post_status
+        except PostNotFound:
+            raise
         except Exception as e:
             print(e)
             raise InterServerException()
 
     async def delete_post(self, post_uid: str, session: AsyncSession) -> None:
         try:
-            post = await self.get_post_by_uid(UUID(post_uid), session)
-            if post is None:
+            post_uid = UUID(post_uid)
+            # everything attached to the post goes in one statement per table
+            # instead of loading it to cascade the delete
+            for model in (TagAndPostLinkModel, Like, Comment, Share):
+                await session.exec(delete(model).where(model.post_uid == post_uid))
+            result = await session.exec(
+                delete(Post).where(Post.uid == post_uid).returning(Post.user_uid)
+            )
+            user_uid = result.scalar_one_or_none()
+            if user_uid is None:
                 raise PostNotFound()
-            await session.delete(post)
+            await session.exec(
+                update(User)
+                .where(User.uid == user_uid)
+                .values(posts_count=User.posts_count - 1)
+            )
             await session.commit()
         except PostNotFound:
             raise
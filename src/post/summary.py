@@ -0,0 +1,93 @@
+from sqlmodel import select
+from sqlalchemy import exists, func, literal_column
+from sqlalchemy.dialects.postgresql import JSONB, aggregate_order_by
+
+from uuid import UUID
+
+from core.database.models import Post, Like, Comment, Share, Tag, TagAndPostLinkModel
+
+# comments embedded in a post detail, the rest is paged
+LATEST_COMMENTS = 3
+
+
+def count_post_children(model, label: str):
+    """correlated count of the rows of model belonging to the selected post"""
+    return (
+        select(func.count())
+        .select_from(model)
+        .where(model.post_uid == Post.uid)
+        .correlate(Post)
+        .scalar_subquery()
+        .label(label)
+    )
+
+
+def get_post_summary_columns() -> list:
+    """columns of PostSummaryModel, the child collections are only counted"""
+    return [
+        Post.uid,
+        Post.caption,
+        Post.post_image_url,
+        Post.image_renditions,
+        Post.status,
+        Post.user_uid,
+        Post.created_at,
+        count_post_children(Like, "likes_count"),
+        count_post_children(Comment, "comments_count"),
+        count_post_children(Share, "shares_count"),
+    ]
+
+
+def _json_list(subquery, columns: list[str], order_by=None):
+    """correlated json array of the rows of subquery, [] when empty"""
+    row = func.jsonb_build_object(
+        *[
+            item
+            for column in columns
+            for item in (literal_column(f"'{column}'"), subquery.c[column])
+        ]
+    )
+    if order_by is not None:
+        row = aggregate_order_by(row, order_by)
+    return (
+        select(
+            func.coalesce(
+                func.jsonb_agg(row), literal_column("'[]'::jsonb"), type_=JSONB
+            )
+        )
+        .select_from(subquery)
+        .scalar_subquery()
+    )
+
+
+def get_post_detail_columns(viewer_uid: UUID) -> list:
+    """columns of PostDetailModel, everything is computed in the one query"""
+    latest_comments = (
+        select(Comment.comment, Comment.commenter_uid, Comment.commented_at)
+        .where(Comment.post_uid == Post.uid)
+        .order_by(Comment.commented_at.desc())
+        .limit(LATEST_COMMENTS)
+        .correlate(Post)
+        .subquery()
+    )
+    tags = (
+        select(Tag.uid, Tag.tag_name)
+        .join(TagAndPostLinkModel, TagAndPostLinkModel.tag_uid == Tag.uid)
+        .where(TagAndPostLinkModel.post_uid == Post.uid)
+        .correlate(Post)
+        .subquery()
+    )
+    liked_by_me = exists().where(
+        Like.post_uid == Post.uid, Like.liker_uid == viewer_uid
+    )
+    return [
+        *get_post_summary_columns(),
+        Post.updated_at,
+        liked_by_me.label("liked_by_me"),
+        _json_list(tags, ["uid", "tag_name"]).label("tags"),
+        _json_list(
+            latest_comments,
+            ["comment", "commenter_uid", "commented_at"],
+            order_by=latest_comments.c.commented_at.desc(),
+        ).label("latest_comments"),
+    ]
@@ -1,10 +1,17 @@
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
 
-from uuid import UUID
+from uuid import UUID, uuid4
 
 from core.database.models import Share
-from core.exceptions.exceptions import InterServerException, InvalidOperation
+from src.auth.schemas import PrincipalModel
+from core.exceptions.exceptions import (
+    InterServerException,
+    InvalidOperation,
+    PostNotFound,
+)
 
 
 class ShareService:
@@ -17,39 +24,39 @@ class ShareService:
             print(e)
             raise InterServerException()
 
-    async def get_share_by_sharer_uid(self, sharer_uid: UUID, session: AsyncSession):
-        try:
-            statement = select(Share).where(Share.sharer_uid == sharer_uid)
-            result = await session.exec(statement)
-            return result.first()
-        except Exception as e:
-            print(e)
-            raise InterServerException()
-
     async def share_the_post(
-        self, user_data: dict, post_uid: UUID, session: AsyncSession
+        self, principal: PrincipalModel, post_uid: UUID, session: AsyncSession
     ):
         try:
-            sharer_uid = UUID(user_data["user_data"]["uid"])
-            already_shared = await self.get_share_by_sharer_uid(sharer_uid, session)
-            if already_shared is not None:
+            # the unique (post_uid, sharer_uid) index rejects a second share
+            result = await session.exec(
+                insert(Share)
+                .values(uid=uuid4(), sharer_uid=principal.uid, post_uid=post_uid)
+                .on_conflict_do_nothing(
+                    index_elements=[Share.post_uid, Share.sharer_uid]
+                )
+                .returning(Share.uid)
+            )
+            if result.first() is None:
                 raise InvalidOperation()
-            new_share_detail = Share(sharer_uid=sharer_uid, post_uid=post_uid)
-            session.add(new_share_detail)
             await session.commit()
             return {
                 "message": "post shared successfully",
             }
+        except IntegrityError:
+            raise PostNotFound()
         except InvalidOperation:
             raise
         except Exception as e:
             print(e)
             raise InterServerException()
 
-    async def get_user_shared_post(self, user_data: dict, session: AsyncSession):
+    async def get_user_shared_post(
+        self, principal: PrincipalModel, session: AsyncSession
+    ):
 
         try:
-            sharer_uid = user_data["user_data"]["uid"]
+            sharer_uid = principal.uid
             statement = select(Share).where(Share.sharer_uid == sharer_uid)
             result = await session.exec(statement)
             return result.all()
@@ -3,18 +3,19 @@ from sqlmodel.ext.asyncio.session import AsyncSession
 
 from typing import Annotated
 
-from core.database.main import get_session
-from core.schemas import PostModel
-from src.auth.dependencies import access_token_bearer
+from core.schemas import PageModel, PostSummaryModel
+from src.auth.dependencies import access_token_bearer, get_read_session
 from .service import tag_service
 
 tag_router = APIRouter()
 
 
-@tag_router.get("/get-all-posts-by-tag")
+@tag_router.get("/get-all-posts-by-tag", response_model=PageModel[PostSummaryModel])
 async def create_tag(
     tag_name: Annotated[str, Query()],
     _: Annotated[dict, Depends(access_token_bearer)],
-    session: Annotated[AsyncSession, Depends(get_session)],
+    session: Annotated[AsyncSession, Depends(get_read_session)],
+    cursor: Annotated[str | None, Query()] = None,
+    limit: Annotated[int, Query(ge=1, le=50)] = 20,
 ):
-    return await tag_service.get_posts_by_tag(tag_name, session)
+    return await tag_service.get_posts_by_tag(tag_name, session, cursor, limit)
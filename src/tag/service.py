@@ -1,100 +1,155 @@
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy import func, tuple_
+from sqlalchemy.dialects.postgresql import insert
 
-from uuid import UUID
+from uuid import UUID, uuid4
+from datetime import datetime
 
 from core.database.models import Tag, Post, TagAndPostLinkModel
-from core.exceptions.exceptions import (
-    TagAlreadyExist,
-    InterServerException,
-    PostNotFound,
-)
+from core.utils.enums import PostStatusEnum
+from core.utils.pagination import encode_cursor, decode_cursor
+from src.post.summary import get_post_summary_columns
+from src.like.service import like_service
+from core.exceptions.exceptions import InterServerException, InvalidCursor
 
 
-class TagService:
-    async def get_tag_by_name(self, tag_name: str, session: AsyncSession) -> Tag | None:
-        try:
-            statement = (
-                select(Tag)
-                .options(selectinload(Tag.posts))
-                .where(Tag.tag_name == tag_name)
-            )
+def normalize_tag_names(tag_names: list[str]) -> list[str]:
+    """lower cased, # prefixed and de-duplicated, in the given order"""
+    normalized = {}
+    for tag_name in tag_names:
+        tag_name = tag_name.strip().lower().lstrip("#").strip()
+        if tag_name:
+            normalized["#" + tag_name] = None
+    return list(normalized)
 
-            result = await session.exec(statement)
-            return result.first()
-        except Exception as e:
-            print(e)
-            raise InterServerException()
 
-    async def create_tag(self, tag_name: str, session: AsyncSession):
-        try:
-            is_tag_in_db = await self.get_tag_by_name(tag_name, session)
-            if is_tag_in_db:
-                raise TagAlreadyExist()
-            new_tag = Tag(tag_name=tag_name)
-            session.add(new_tag)
-            await session.commit()
-            return new_tag
-        except TagAlreadyExist:
-            raise
-        except Exception as e:
-            print(e)
-            raise InterServerException()
+class TagService:
+    async def get_or_create_tag_uids(
+        self, tag_names: list[str], session: AsyncSession
+    ) -> dict[str, UUID]:
+        """uids of the normalized tag names, missing tags are created. Tags
+        created concurrently by another transaction are selected again instead
+        of duplicated. Missing tags are inserted in name order, so posts
+        creating the same tags concurrently lock them in the same order"""
+        result = await session.exec(
+            select(Tag.tag_name, Tag.uid).where(Tag.tag_name.in_(tag_names))
+        )
+        tag_uids = dict(result.all())
+        missing = sorted(name for name in tag_names if name not in tag_uids)
+        if missing:
+            result = await session.exec(
+                insert(Tag)
+                .values([{"uid": uuid4(), "tag_name": name} for name in missing])
+                .on_conflict_do_nothing(index_elements=[Tag.tag_name])
+                .returning(Tag.tag_name, Tag.uid)
+            )
+            tag_uids.update(result.all())
+        if len(tag_uids) < len(tag_names):
+            result = await session.exec(
+                select(Tag.tag_name, Tag.uid).where(
+                    Tag.tag_name.in_(
+                        [name for name in tag_names if name not in tag_uids]
+                    )
+                )
+            )
+            tag_uids.update(result.all())
+        return tag_uids
 
-    async def add_tag_to_post(
+    async def attach_tags(
         self,
         post_uid: UUID,
+        tag_names: list[str],
+        session: AsyncSession,
+    ) -> None:
+        """links the tags to the post in a fixed number of statements, missing
+        tags are created. Nothing is committed, the caller owns the transaction"""
+        tag_names = normalize_tag_names(tag_names)
+        if not tag_names:
+            return
+        tag_uids = await self.get_or_create_tag_uids(tag_names, session)
+        post_created_at = (
+            select(func.coalesce(Post.created_at, func.now()))
+            .where(Post.uid == post_uid)
+            .scalar_subquery()
+        )
+        await session.exec(
+            insert(TagAndPostLinkModel)
+            .values(
+                [
+                    {
+                        "tag_uid": tag_uid,
+                        "post_uid": post_uid,
+                        "post_created_at": post_created_at,
+                    }
+                    for tag_uid in tag_uids.values()
+                ]
+            )
+            .on_conflict_do_nothing(
+                index_elements=[
+                    TagAndPostLinkModel.tag_uid,
+                    TagAndPostLinkModel.post_uid,
+                ]
+            )
+        )
+
+    async def get_posts_by_tag(
+        self,
         tag_name: str,
         session: AsyncSession,
+        cursor: str | None = None,
+        limit: int = 20,
     ) -> dict:
+        """newest first page of the ready posts carrying the tag"""
         try:
-            from src.post.service import post_service
-
-            post: Post | None = await post_service.get_post_by_uid(post_uid, session)
-            if post is None:
-                raise PostNotFound()
-            tag_name = tag_name.strip().lower()
-            if not tag_name.startswith("#"):
-                tag_name = "#" + tag_name
-            tag: Tag | None = await self.get_tag_by_name(tag_name, session)
-
-            if tag is None:
-                new_tag = await self.create_tag(tag_name, session)
-                link_entry = TagAndPostLinkModel(tag_uid=new_tag.uid, post_uid=post.uid)
-                session.add(link_entry)
-                # await session.refresh(link_entry)
-            else:
-                existing_link = await session.exec(
-                    select(TagAndPostLinkModel).where(
-                        TagAndPostLinkModel.post_uid == post.uid,
-                        TagAndPostLinkModel.tag_uid == tag.uid,
+            tag_names = normalize_tag_names([tag_name])
+            if not tag_names:
+                return {"items": [], "next_cursor": None}
+            statement = (
+                select(
+                    *get_post_summary_columns(),
+                    TagAndPostLinkModel.post_created_at,
+                )
+                .select_from(Tag)
+                .join(TagAndPostLinkModel, TagAndPostLinkModel.tag_uid == Tag.uid)
+                .join(Post, Post.uid == TagAndPostLinkModel.post_uid)
+                .where(
+                    Tag.tag_name == tag_names[0],
+                    Post.status == PostStatusEnum.ready,
+                )
+                .order_by(
+                    TagAndPostLinkModel.post_created_at.desc(),
+                    TagAndPostLinkModel.post_uid.desc(),
+                )
+                .limit(limit + 1)
+            )
+            if cursor is not None:
+                last_created_at, last_uid = decode_cursor(
+                    cursor, datetime.fromisoformat, UUID
+                )
+                statement = statement.where(
+                    tuple_(
+                        TagAndPostLinkModel.post_created_at,
+                        TagAndPostLinkModel.post_uid,
                     )
+                    < tuple_(last_created_at, last_uid)
                 )
-                if not existing_link.first():
-                    link_entry = TagAndPostLinkModel(post_uid=post.uid, tag_uid=tag.uid)
-                    session.add(link_entry)
-                    # await session.refresh(link_entry)
-
-            await session.commit()
-            return {"message": "Tag added successfully"}
+            result = await session.exec(statement)
+            rows = result.all()
 
-        except (PostNotFound, TagAlreadyExist):
+            next_cursor = None
+            if len(rows) > limit:
+                rows = rows[:limit]
+                next_cursor = encode_cursor([rows[-1].post_created_at, rows[-1].uid])
+            return {
+                "items": await like_service.apply_cached_likes(rows),
+                "next_cursor": next_cursor,
+            }
+        except InvalidCursor:
             raise
         except Exception as e:
             print(e)
             raise InterServerException()
 
-    async def get_posts_by_tag(self, tag_name, session):
-        try:
-            tag: Tag | None = await self.get_tag_by_name(tag_name, session)
-            if tag is None:
-                return []
-            return tag.posts
-
-        except Exception as e:
-            print(e)
-            raise InterServerException()
-
 
 tag_service = TagService()
@@ -0,0 +1,54 @@
+from fastapi import APIRouter, Body, Path, Query, Request, Depends
+
+from typing import Annotated
+from uuid import UUID
+
+from src.auth.dependencies import get_current_principal
+from src.auth.schemas import PrincipalModel
+from .schemas import UploadInitModel, UploadStatusModel, UploadCompleteModel
+from .service import upload_service
+
+
+upload_router = APIRouter()
+
+
+@upload_router.post("/", response_model=UploadStatusModel, status_code=201)
+async def create_upload(
+    init_data: Annotated[UploadInitModel, Body()],
+    principal: Annotated[PrincipalModel, Depends(get_current_principal)],
+):
+    return await upload_service.create_upload(principal.uid, init_data)
+
+
+@upload_router.get("/{upload_id}", response_model=UploadStatusModel)
+async def get_upload(
+    upload_id: Annotated[UUID, Path()],
+    principal: Annotated[PrincipalModel, Depends(get_current_principal)],
+):
+    return await upload_service.get_upload(upload_id, principal.uid)
+
+
+@upload_router.put("/{upload_id}", response_model=UploadStatusModel)
+async def put_chunk(
+    upload_id: Annotated[UUID, Path()],
+    offset: Annotated[int, Query(ge=0)],
+    request: Request,
+    principal: Annotated[PrincipalModel, Depends(get_current_principal)],
+):
+    return await upload_service.put_chunk(upload_id, principal.uid, offset, request)
+
+
+@upload_router.post("/{upload_id}/complete", response_model=UploadCompleteModel)
+async def complete_upload(
+    upload_id: Annotated[UUID, Path()],
+    principal: Annotated[PrincipalModel, Depends(get_current_principal)],
+):
+    return await upload_service.complete_upload(upload_id, principal.uid)
+
+
+@upload_router.delete("/{upload_id}", status_code=204)
+async def cancel_upload(
+    upload_id: Annotated[UUID, Path()],
+    principal: Annotated[PrincipalModel, Depends(get_current_principal)],
+):
+    await upload_service.cancel_upload(upload_id, principal.uid)
@@ -0,0 +1,23 @@
+from pydantic import BaseModel, Field
+
+from uuid import UUID
+
+
+class UploadInitModel(BaseModel):
+    total_size: int = Field(gt=0)
+    # when given the completed upload must match this hex sha256
+    sha256: str | None = None
+
+
+class UploadStatusModel(BaseModel):
+    upload_id: UUID
+    total_size: int
+    received: int
+    completed: bool
+    max_chunk_size: int
+
+
+class UploadCompleteModel(BaseModel):
+    upload_id: UUID
+    total_size: int
+    sha256: str
@@ -0,0 +1,323 @@
+from fastapi import Request, UploadFile
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from uuid import UUID, uuid4
+
+from core.exceptions.exceptions import (
+    InterServerException,
+    InvalidOperation,
+    UploadNotFound,
+    UploadOffsetMismatch,
+    UploadTooLarge,
+    UploadIncomplete,
+)
+from core.utils.metrics import register_metrics
+from src.config import Config
+from src.post.media import media_pipeline
+from .schemas import UploadInitModel
+
+HASH_READ_SIZE = 1024 * 1024
+
+
+class UploadService:
+    """Chunked, resumable uploads spooled to local disk.
+
+    An upload session is a data file plus a json sidecar holding its owner,
+    expected size and hash. The received offset is the size of the data file,
+    so a client that lost its connection asks for it and sends the rest. The
+    running sha256 is kept in process and rebuilt from the file when a chunk
+    arrives in another worker. A completed upload is claimed once by the post
+    and profile endpoints and handed to the media pipeline. Sessions past
+    their expiry are removed by a periodic sweep.
+    """
+
+    def __init__(self, upload_dir: str):
+        self.upload_dir = Path(upload_dir)
+        # upload_id -> (offset hashed so far, running sha256)
+        self._hashers: dict[UUID, tuple[int, "hashlib._Hash"]] = {}
+        self._locks: dict[UUID, asyncio.Lock] = {}
+        self._sweeper: asyncio.Task | None = None
+        self._swept = 0
+
+    def _get_data_path(self, upload_id: UUID) -> Path:
+        return self.upload_dir / f"{upload_id}.part"
+
+    def _get_meta_path(self, upload_id: UUID) -> Path:
+        return self.upload_dir / f"{upload_id}.json"
+
+    def _write_meta(self, upload_id: UUID, meta: dict) -> None:
+        self.upload_dir.mkdir(parents=True, exist_ok=True)
+        path = self._get_meta_path(upload_id)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(meta))
+        os.replace(tmp_path, path)
+        self._get_data_path(upload_id).touch()
+
+    def _read_meta(self, upload_id: UUID) -> dict | None:
+        try:
+            meta = json.loads(self._get_meta_path(upload_id).read_text())
+        except FileNotFoundError:
+            return None
+        if meta["expires_at"] < time.time():
+            self._remove(upload_id)
+            return None
+        return meta
+
+    def _remove(self, upload_id: UUID) -> None:
+        self._get_meta_path(upload_id).unlink(missing_ok=True)
+        self._get_data_path(upload_id).unlink(missing_ok=True)
+        self._hashers.pop(upload_id, None)
+        self._locks.pop(upload_id, None)
+
+    def _sweep(self) -> int:
+        """removes the expired sessions, and data files whose sidecar is gone
+        for longer than a session lasts"""
+        if not self.upload_dir.is_dir():
+            return 0
+        now = time.time()
+        removed = 0
+        for path in self.upload_dir.iterdir():
+            try:
+                upload_id = UUID(path.stem)
+            except ValueError:
+                continue
+            try:
+                if path.suffix == ".json":
+                    if json.loads(path.read_text())["expires_at"] >= now:
+                        continue
+                elif path.suffix in (".part", ".tmp"):
+                    if self._get_meta_path(upload_id).exists():
+                        continue
+                    if path.stat().st_mtime + Config.UPLOAD_SESSION_SECONDS >= now:
+                        continue
+                else:
+                    continue
+            except FileNotFoundError:
+                # removed meanwhile
+                continue
+            self._remove(upload_id)
+            path.unlink(missing_ok=True)
+            removed += 1
+        return removed
+
+    async def run_sweeper(self) -> None:
+        while True:
+            try:
+                self._swept += await asyncio.to_thread(self._sweep)
+            except Exception as e:
+                print(f"Error while sweeping uploads: {e}")
+            await asyncio.sleep(Config.UPLOAD_SWEEP_INTERVAL_SECONDS)
+
+    def start(self) -> None:
+        self._sweeper = asyncio.create_task(self.run_sweeper())
+
+    async def stop(self) -> None:
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            await asyncio.gather(self._sweeper, return_exceptions=True)
+            self._sweeper = None
+
+    def metrics(self) -> dict:
+        return {"sessions_swept": self._swept}
+
+    def _get_received(self, upload_id: UUID) -> int:
+        return self._get_data_path(upload_id).stat().st_size
+
+    def _hash_file(self, upload_id: UUID) -> tuple[int, "hashlib._Hash"]:
+        hasher = hashlib.sha256()
+        offset = 0
+        with open(self._get_data_path(upload_id), "rb") as file:
+            while chunk := file.read(HASH_READ_SIZE):
+                hasher.update(chunk)
+                offset += len(chunk)
+        return offset, hasher
+
+    def _append(self, upload_id: UUID, chunk: bytes) -> None:
+        with open(self._get_data_path(upload_id), "ab") as file:
+            file.write(chunk)
+
+    def _truncate(self, upload_id: UUID, size: int) -> None:
+        os.truncate(self._get_data_path(upload_id), size)
+
+    async def _get_owned_meta(self, upload_id: UUID, owner_uid: UUID) -> dict:
+        meta = await asyncio.to_thread(self._read_meta, upload_id)
+        if meta is None or meta["owner_uid"] != str(owner_uid):
+            raise UploadNotFound()
+        return meta
+
+    async def _get_hasher(
+        self, upload_id: UUID, received: int
+    ) -> tuple[int, "hashlib._Hash"]:
+        offset, hasher = self._hashers.get(upload_id, (None, None))
+        if offset != received:
+            offset, hasher = await asyncio.to_thread(self._hash_file, upload_id)
+        return offset, hasher
+
+    def _get_status(self, upload_id: UUID, meta: dict, received: int) -> dict:
+        return {
+            "upload_id": upload_id,
+            "total_size": meta["total_size"],
+            "received": received,
+            "completed": meta["completed"],
+            "max_chunk_size": Config.MAX_UPLOAD_CHUNK_SIZE,
+        }
+
+    async def create_upload(self, owner_uid: UUID, init_data: UploadInitModel):
+        try:
+            if init_data.total_size > Config.MAX_UPLOAD_SIZE:
+                raise UploadTooLarge()
+            upload_id = uuid4()
+            meta = {
+                "owner_uid": str(owner_uid),
+                "total_size": init_data.total_size,
+                "sha256": init_data.sha256.lower() if init_data.sha256 else None,
+                "completed": False,
+                "expires_at": time.time() + Config.UPLOAD_SESSION_SECONDS,
+            }
+            await asyncio.to_thread(self._write_meta, upload_id, meta)
+            return self._get_status(upload_id, meta, 0)
+        except UploadTooLarge:
+            raise
+        except Exception as e:
+            print(e)
+            raise InterServerException()
+
+    async def get_upload(self, upload_id: UUID, owner_uid: UUID):
+        try:
+            meta = await self._get_owned_meta(upload_id, owner_uid)
+            received = await asyncio.to_thread(self._get_received, upload_id)
+            return self._get_status(upload_id, meta, received)
+        except UploadNotFound:
+            raise
+        except Exception as e:
+            print(e)
+            raise InterServerException()
+
+    async def put_chunk(
+        self, upload_id: UUID, owner_uid: UUID, offset: int, request: Request
+    ):
+        try:
+            meta = await self._get_owned_meta(upload_id, owner_uid)
+            if meta["completed"]:
+                raise UploadOffsetMismatch()
+            lock = self._locks.setdefault(upload_id, asyncio.Lock())
+            async with lock:
+                received = await asyncio.to_thread(self._get_received, upload_id)
+                if offset != received:
+                    raise UploadOffsetMismatch()
+                received, hasher = await self._get_hasher(upload_id, received)
+                chunk_end = min(
+                    meta["total_size"], offset + Config.MAX_UPLOAD_CHUNK_SIZE
+                )
+                try:
+                    # the body is streamed to disk, never held in memory whole
+                    async for chunk in request.stream():
+                        if not chunk:
+                            continue
+                        if received + len(chunk) > chunk_end:
+                            raise UploadTooLarge()
+                        await asyncio.to_thread(self._append, upload_id, chunk)
+                        hasher.update(chunk)
+                        received += len(chunk)
+                except UploadTooLarge:
+                    # drop the whole chunk so the client can resend it smaller
+                    await asyncio.to_thread(self._truncate, upload_id, offset)
+                    self._hashers.pop(upload_id, None)
+                    raise
+                except BaseException:
+                    # keep what was written, the client resumes from there
+                    self._hashers[upload_id] = (received, hasher)
+                    raise
+                self._hashers[upload_id] = (received, hasher)
+            return self._get_status(upload_id, meta, received)
+        except (UploadNotFound, UploadOffsetMismatch, UploadTooLarge):
+            raise
+        except Exception as e:
+            print(e)
+            raise InterServerException()
+
+    async def complete_upload(self, upload_id: UUID, owner_uid: UUID):
+        try:
+            meta = await self._get_owned_meta(upload_id, owner_uid)
+            received = await asyncio.to_thread(self._get_received, upload_id)
+            if received != meta["total_size"]:
+                raise UploadIncomplete()
+            _, hasher = await self._get_hasher(upload_id, received)
+            digest = hasher.hexdigest()
+            if meta["sha256"] is not None and meta["sha256"] != digest:
+                raise UploadIncomplete()
+            meta["completed"] = True
+            meta["sha256"] = digest
+            await asyncio.to_thread(self._write_meta, upload_id, meta)
+            self._hashers.pop(upload_id, None)
+            return {
+                "upload_id": upload_id,
+                "total_size": received,
+                "sha256": digest,
+            }
+        except (UploadNotFound, UploadIncomplete):
+            raise
+        except Exception as e:
+            print(e)
+            raise InterServerException()
+
+    async def claim_upload(
+        self, upload_id: UUID, owner_uid: UUID, destination: Path
+    ) -> None:
+        """moves a completed upload to destination, it can be claimed once"""
+        try:
+            meta = await self._get_owned_meta(upload_id, owner_uid)
+            if not meta["completed"]:
+                raise UploadIncomplete()
+            await asyncio.to_thread(
+                destination.parent.mkdir, parents=True, exist_ok=True
+            )
+            await asyncio.to_thread(
+                os.replace, self._get_data_path(upload_id), destination
+            )
+            await asyncio.to_thread(self._remove, upload_id)
+        except (UploadNotFound, UploadIncomplete):
+            raise
+        except Exception as e:
+            print(e)
+            raise InterServerException()
+
+    async def spool_image(
+        self,
+        owner_uid: UUID,
+        target_uid: UUID,
+        image_file: UploadFile | None,
+        upload_id: UUID | None,
+        spool_uid: UUID | None = None,
+    ) -> None:
+        """spools the image of a post or profile for the media pipeline, from
+        either a multipart file or a completed upload"""
+        if (image_file is None) == (upload_id is None):
+            raise InvalidOperation()
+        if upload_id is not None:
+            await self.claim_upload(
+                upload_id,
+                owner_uid,
+                media_pipeline.get_spool_path(target_uid, spool_uid),
+            )
+        else:
+            await media_pipeline.spool(image_file, target_uid, spool_uid)
+
+    async def cancel_upload(self, upload_id: UUID, owner_uid: UUID) -> None:
+        try:
+            await self._get_owned_meta(upload_id, owner_uid)
+            await asyncio.to_thread(self._remove, upload_id)
+        except UploadNotFound:
+            raise
+        except Exception as e:
+            print(e)
+            raise InterServerException()
+
+
+upload_service = UploadService(Config.UPLOAD_SPOOL_DIR)
+register_metrics("uploads", upload_service.metrics)